@@ -0,0 +1,579 @@
+#!/usr/local/bin/python3
+
+"""
+Benchmarks for pyr and lib.py. Everything runs offline against generated
+data, so results are comparable between runs on the same machine.
+
+    bench.py                          run everything
+    bench.py lib curry -o after.json  run some groups and save the results
+    bench.py --compare before.json after.json
+
+`startup` compares cold start of pyr against exec-ing lib.py the way it
+used to, `importtime` prints a per-module breakdown of that startup, `curry`
+measures per-call overhead of curried functions, `lib` times the hot paths
+in lib.py on realistic data, `transduce` compares pipe with fused
+transducer pipelines on 1M items, `numpy` finds the list size where the
+numpy backend starts to pay off, `pmap` compares successive assoc_path
+calls on a large dict and PMap, `case` compares case conversion with the
+old chained re.sub version, `parallel` compares mapl, count_by and reducel
+with their process and thread pool counterparts, `async` runs amapl
+against a local stub server at increasing concurrency limits and `pyr`
+measures end to end throughput.
+"""
+
+import argparse, json, os, platform, random, re, statistics, subprocess, sys, tempfile, time, timeit, py_compile
+
+DIR = os.path.dirname(os.path.realpath(__file__))
+LIB = os.path.join(DIR, 'lib.py')
+PYR = os.path.join(DIR, 'pyr.py')
+
+
+class Runner(object):
+    def __init__(self, runs, warmups=1):
+        self.runs = runs
+        self.warmups = warmups
+        self.results = {}
+
+    def record(self, name, timings):
+        self.results[name] = {
+            'median': statistics.median(timings),
+            'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'min': min(timings),
+            'timings': timings,
+        }
+
+        print("{:<36} {:>10} +- {:>9}  (min {})".format(
+            name,
+            format_seconds(statistics.median(timings)),
+            format_seconds(self.results[name]['stdev']),
+            format_seconds(min(timings)),
+        ))
+
+    def command(self, name, cmd, stdin=b''):
+        def run():
+            subprocess.run(cmd, input=stdin, stdout=subprocess.DEVNULL, check=True, cwd=DIR)
+
+        for _ in range(self.warmups):
+            run()
+
+        timings = []
+        for _ in range(self.runs):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+
+        self.record(name, timings)
+
+    def call(self, name, stmt, namespace=None):
+        timer = timeit.Timer(stmt, globals=namespace)
+
+        # Calibrate the loop count like pyperf does, then time per call
+        number, _ = timer.autorange()
+        timer.repeat(repeat=self.warmups, number=number)
+        timings = timer.repeat(repeat=self.runs, number=number)
+
+        self.record(name, [t / number for t in timings])
+
+
+def format_seconds(seconds):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            return "{:.2f}{}".format(seconds / scale, unit)
+
+    return "{:.1f}ns".format(seconds * 1e9)
+
+
+# Workloads. Seeded so every run sees the same data.
+
+
+def make_records(n, seed=0):
+    rand = random.Random(seed)
+    cities = ['Austin', 'Boston', 'Chicago', 'Denver', 'El Paso', 'Fresno']
+
+    return [
+        {
+            'id': i,
+            'userName': 'user{}'.format(rand.randrange(n)),
+            'isActive': rand.random() > 0.3,
+            'score': rand.random() * 100,
+            'tags': rand.sample(['a', 'b', 'c', 'd', 'e', 'f'], 3),
+            'address': {
+                'city': rand.choice(cities),
+                'geo': {'lat': rand.uniform(-90, 90), 'lng': rand.uniform(-180, 180)},
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def make_nested(depth, width):
+    if depth == 0:
+        return list(range(width))
+
+    return [make_nested(depth - 1, width) for _ in range(width)]
+
+
+def make_keys(n, seed=0):
+    rand = random.Random(seed)
+    words = ['user', 'account', 'created', 'updated', 'id', 'name', 'http', 'url', 'value']
+
+    return [
+        ''.join(w.capitalize() if i else w for i, w in enumerate(rand.sample(words, 3)))
+        for _ in range(n)
+    ]
+
+
+# Benchmark groups
+
+
+def bench_startup(runner):
+    # Make sure we're comparing against warm bytecode, not a first compile
+    py_compile.compile(LIB)
+
+    runner.command('startup.python -c pass', [sys.executable, '-c', 'pass'])
+    runner.command('startup.exec lib.py', [sys.executable, '-c', 'exec(open({!r}).read())'.format(LIB)])
+    runner.command('startup.import lib', [sys.executable, '-c', 'import lib'])
+    runner.command('startup.pyr len(x)', [sys.executable, PYR, 'len(x)'], b'a\nb\n')
+    runner.command('startup.pyr pluck', [sys.executable, PYR, '-j', 'pluck("a", x)'], b'[{"a": 1}]')
+
+
+def importtime_breakdown(cmd, stdin=b'', top=8):
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *cmd],
+        input=stdin,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+        cwd=DIR,
+    )
+
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    rows = []
+    for line in process.stderr.decode().splitlines()[1:]:
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    print(' '.join(cmd))
+    print("  total {:.2f}ms".format(sum(self_us for _, self_us, _ in rows) / 1000))
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print("  {:8.2f}ms {:8.2f}ms {}".format(cumulative_us / 1000, self_us / 1000, name))
+
+
+def bench_importtime(runner):
+    # Not timed, just a report
+    py_compile.compile(LIB)
+
+    importtime_breakdown(['-c', 'import lib'])
+    importtime_breakdown([PYR, 'len(x)'], b'a\nb\n')
+    importtime_breakdown([PYR, '-j', 'pluck("a", x)'], b'[{"a": 1}]')
+
+
+def legacy_curry_n(n, fn, carryover_args=(), carryover_kwargs=()):
+    # curry_n as it was before the fast path, for comparison
+    def _curried(*args, **kwargs):
+        cur_n = len(args) + len(kwargs)
+
+        combined_args = carryover_args + args
+        combined_kwargs = {}
+        combined_kwargs.update(carryover_kwargs)
+        combined_kwargs.update(kwargs)
+
+        if cur_n >= n:
+            return fn(*combined_args, **combined_kwargs)
+        else:
+            return legacy_curry_n(n - cur_n, fn, combined_args, combined_kwargs)
+
+    return _curried
+
+
+def bench_curry(runner):
+    import lib
+
+    def add(x, y):
+        return x + y
+
+    namespace = {
+        'add': add,
+        'curried': lib.curry_n(2, add),
+        'partial': lib.curry_n(2, add)(1),
+        'legacy': legacy_curry_n(2, add),
+        'legacy_partial': legacy_curry_n(2, add)(1),
+    }
+
+    runner.call('curry.plain call', 'add(1, 2)', namespace)
+    runner.call('curry.curried full', 'curried(1, 2)', namespace)
+    runner.call('curry.legacy full', 'legacy(1, 2)', namespace)
+    runner.call('curry.curried partial', 'partial(2)', namespace)
+    runner.call('curry.legacy partial', 'legacy_partial(2)', namespace)
+
+
+def bench_lib(runner):
+    import lib
+
+    namespace = dict(vars(lib))
+    namespace.update({
+        'records': make_records(10000),
+        'nested': make_nested(4, 10),
+        'keys': make_keys(1000),
+        'long_string': ''.join(make_keys(2000)),
+    })
+
+    runner.call('lib.mapl', 'mapl(prop.c("score"), records)', namespace)
+    runner.call('lib.filterl', 'filterl(prop_eq.c("isActive", True), records)', namespace)
+    runner.call('lib.pluck', 'pluck("userName", records)', namespace)
+    runner.call('lib.group_by', 'group_by(path.c(["address", "city"]), records)', namespace)
+    runner.call('lib.path', 'for r in records: path(["address", "geo", "lat"], r)', namespace)
+    runner.call('lib.path curried', 'mapl(path.c(["address", "geo", "lat"]), records)', namespace)
+    runner.call('lib.compile_path', 'mapl(compile_path(("address", "geo", "lat")), records)', namespace)
+    runner.call('lib.path missing', 'for r in records: path(["address", "nope", "lat"], r)', namespace)
+    runner.call('lib.assoc_path', 'for r in records[:1000]: assoc_path(["address", "geo", "lat"], 0, r)', namespace)
+    runner.call('lib.flatten', 'flatten(nested)', namespace)
+    runner.call('lib.iflatten', 'do_all(iflatten(nested))', namespace)
+    runner.call('lib.pluck filterl', 'do_all(pluck("id", filterl(prop.c("isActive"), records)))', namespace)
+    runner.call('lib.ipluck ifilterl', 'do_all(ipluck("id", ifilterl(prop.c("isActive"), records)))', namespace)
+    runner.call('lib.to_snake keys', 'for k in keys: to_snake(k)', namespace)
+    runner.call('lib.to_snake keys uncached', 'for k in keys: to_snake.__wrapped__(k)', namespace)
+    runner.call('lib.to_snake long string', 'to_snake(long_string)', namespace)
+    runner.call('lib.modify_keys_recursive', 'modify_keys_recursive(to_snake, records[:1000])', namespace)
+    runner.call('lib.modify_values_recursive', 'modify_values_recursive(str, records[:1000])', namespace)
+    runner.call('lib.convert_leaves', 'convert_leaves(records[:1000], str, len)', namespace)
+    runner.call('lib.difference', 'difference(keys, keys[::2])', namespace)
+    runner.call('lib.uniq', 'uniq(keys)', namespace)
+    runner.call('lib.uniq records', 'uniq(records[:1000] + records[:1000])', namespace)
+    runner.call('lib.dupes records', 'dupes(records[:1000] + records[:1000])', namespace)
+    runner.call('lib.Table build', 'Table(records)', namespace)
+    namespace['table'] = lib.Table(namespace['records'])
+    runner.call('lib.pluck Table', 'pluck("userName", table)', namespace)
+    runner.call('lib.filterl where_eq', 'filterl(where_eq.c({"isActive": True}), records)', namespace)
+    runner.call('lib.filterl where_eq Table', 'filterl(where_eq.c({"isActive": True}), table)', namespace)
+    runner.call('lib.group_by_key', 'group_by_key("isActive", records)', namespace)
+    runner.call('lib.group_by_key Table', 'group_by_key("isActive", table)', namespace)
+    runner.call('lib.diff_collections', 'diff_collections(records[:5000], records[2500:])', namespace)
+
+
+def peak_memory(name, stmt, namespace):
+    import tracemalloc
+
+    tracemalloc.start()
+    exec(stmt, namespace)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("{:<36} {:>10.1f}MB peak allocated".format(name, peak / 1e6))
+
+
+def legacy_to_snake(value):
+    # to_snake as it was before case_words, for comparison
+    return re.sub(
+        '([a-z0-9])([A-Z])',
+        r'\1_\2',
+        re.sub(
+            '(^_)_*([A-Z][a-z]+)',
+            r'\1_\2',
+            re.sub(r' +', '_', value),
+        )
+    ).lower()
+
+
+def legacy_to_camel(value):
+    first, *rest = legacy_to_snake(value).split('_')
+
+    return first + "".join([word.capitalize() for word in rest])
+
+
+def bench_case(runner):
+    import lib
+
+    namespace = dict(vars(lib))
+    namespace.update({
+        'keys': make_keys(1000),
+        # Cold runs clear the cache, so they only see each key once
+        'unique': sorted(set(make_keys(1000))),
+        'legacy_to_snake': legacy_to_snake,
+        'legacy_to_camel': legacy_to_camel,
+    })
+
+    runner.call('case.legacy to_snake unique', 'for k in unique: legacy_to_snake(k)', namespace)
+    runner.call('case.to_snake unique cold', 'case_words.cache_clear()\nfor k in unique: to_snake.__wrapped__(k)', namespace)
+    runner.call('case.legacy to_snake', 'for k in keys: legacy_to_snake(k)', namespace)
+    runner.call('case.to_snake', 'for k in keys: to_snake(k)', namespace)
+    runner.call('case.legacy to_camel', 'for k in keys: legacy_to_camel(k)', namespace)
+    runner.call('case.to_camel', 'for k in keys: to_camel(k)', namespace)
+    runner.call('case.legacy snake and camel', '[(legacy_to_snake(k), legacy_to_camel(k)) for k in keys]', namespace)
+    runner.call('case.to_case_all snake and camel', 'to_case_all("snake", keys), to_case_all("camel", keys)', namespace)
+
+
+def bench_transduce(runner):
+    import lib
+
+    namespace = dict(vars(lib))
+    namespace.update({
+        'data': list(range(1000000)),
+        'odd': lambda x: x % 2,
+        'double': lambda x: x * 2,
+        'bucket': lambda x: x % 10,
+    })
+
+    stmts = [
+        ('transduce.pipe', 'pipe(filterl.c(odd), mapl.c(double), count_by.c(bucket))(data)'),
+        ('transduce.xseq', 'count_by(bucket, xseq(xpipe(xfilter(odd), xmap(double)), data))'),
+        ('transduce.xseq steps', 'count_by(bucket, xseq_steps(xpipe(xfilter(odd), xmap(double)), data))'),
+        ('transduce.transduce', 'transduce(xpipe(xfilter(odd), xmap(double)), add, 0, data)'),
+        ('transduce.reducel pipe', 'reducel(add, 0, mapl(double, filterl(odd, data)))'),
+    ]
+
+    for name, stmt in stmts:
+        runner.call(name, stmt, namespace)
+
+    for name, stmt in stmts:
+        peak_memory(name, stmt, namespace)
+
+
+def bench_numpy(runner):
+    import lib
+
+    if lib.get_numpy() is None:
+        print("numpy isn't installed, skipping")
+        return
+
+    namespace = dict(vars(lib))
+    threshold = lib.NUMPY_MIN_SIZE
+
+    try:
+        for size in [100, 1000, 10000, 100000, 1000000]:
+            namespace['ints'] = list(range(size))
+
+            for backend, min_size in [('python', float('inf')), ('numpy', 0)]:
+                lib.NUMPY_MIN_SIZE = min_size
+
+                runner.call('numpy.{} mapl {}'.format(backend, size), 'mapl(add.c(1), ints)', namespace)
+                runner.call('numpy.{} filterl {}'.format(backend, size), 'filterl(gt.c(500), ints)', namespace)
+                runner.call('numpy.{} reducel {}'.format(backend, size), 'reducel(add, 0, ints)', namespace)
+    finally:
+        lib.NUMPY_MIN_SIZE = threshold
+
+
+def bench_pmap(runner):
+    import lib
+
+    rand = random.Random(0)
+    doc = {
+        'users': {str(i): record for i, record in enumerate(make_records(10000))},
+        'meta': {'version': 1},
+    }
+
+    namespace = dict(vars(lib))
+    namespace.update({
+        'doc': doc,
+        'frozen': lib.freeze(doc),
+        'paths': [['users', str(rand.randrange(10000)), 'address', 'city'] for _ in range(1000)],
+    })
+
+    stmt = '''
+value = {}
+for p in paths:
+    value = assoc_path(p, 'Nowhere', value)
+'''
+
+    runner.call('pmap.assoc_path dict 1000x', stmt.format('doc'), namespace)
+    runner.call('pmap.assoc_path PMap 1000x', stmt.format('frozen'), namespace)
+    runner.call('pmap.path dict', 'for p in paths: path(p, doc)', namespace)
+    runner.call('pmap.path PMap', 'for p in paths: path(p, frozen)', namespace)
+    runner.call('pmap.freeze', 'freeze(doc)', namespace)
+
+
+def slow_identity(x):
+    # Stands in for a call that waits on I/O
+    time.sleep(0.001)
+
+    return x
+
+
+def bench_parallel(runner):
+    import lib, operator
+
+    # Workers resolve functions by reference, and pools forked up front can't
+    # see __main__, so use functions from modules they can import
+    import bench
+
+    namespace = dict(vars(lib))
+    namespace.update({
+        'keys': make_keys(20000),
+        'numbers': list(range(1000000)),
+        'snake': bench.legacy_to_snake,
+        'plus': operator.add,
+        'slow_identity': slow_identity,
+        'jobs': os.cpu_count(),
+    })
+
+    # Start the pools up front, like a long running script would
+    lib.pmapl(len, namespace['keys'][:1000], jobs=os.cpu_count())
+    lib.pmapl(len, namespace['keys'][:1000], jobs=32, threads=True)
+
+    runner.call('parallel.mapl', 'mapl(snake, keys)', namespace)
+    runner.call('parallel.pmapl', 'pmapl(snake, keys, jobs=jobs)', namespace)
+    runner.call('parallel.count_by', 'count_by(snake, keys)', namespace)
+    runner.call('parallel.pcount_by', 'pcount_by(snake, keys, jobs=jobs)', namespace)
+    runner.call('parallel.reducel', 'reducel(plus, 0, numbers)', namespace)
+    runner.call('parallel.preduce', 'preduce(plus, 0, numbers, jobs=jobs)', namespace)
+    runner.call('parallel.mapl io', 'mapl(slow_identity, range(100))', namespace)
+    runner.call('parallel.pmapl io threads', 'pmapl(slow_identity, range(100), jobs=32, threads=True)', namespace)
+
+
+def start_stub_server(delay):
+    import asyncio, threading
+
+    # Answers each line after delay seconds, like a slow local service
+    async def handle(reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            await asyncio.sleep(delay)
+            writer.write(line)
+            await writer.drain()
+
+        writer.close()
+
+    ready = threading.Event()
+    address = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0))
+        address['port'] = server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+
+    return address['port']
+
+
+def bench_async(runner):
+    import asyncio, lib
+
+    port = start_stub_server(0.005)
+
+    async def request(x):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write('{}\n'.format(x).encode())
+        await writer.drain()
+        line = await reader.readline()
+        writer.close()
+
+        return int(line)
+
+    namespace = {'asyncio': asyncio, 'amapl': lib.amapl, 'request': request}
+
+    for limit in [1, 4, 16, 64]:
+        runner.call(
+            'async.amapl 200 requests limit {}'.format(limit),
+            'asyncio.run(amapl(request, range(200), limit={}))'.format(limit),
+            namespace,
+        )
+
+
+def bench_pyr(runner):
+    lines = '\n'.join(make_keys(100000)).encode()
+    records = json.dumps(make_records(10000)).encode()
+
+    runner.command('pyr.startup', [sys.executable, PYR, 'len(x)'], b'a\n')
+    runner.command('pyr.-l throughput 100k lines', [sys.executable, PYR, '-l', 'to_snake(x)'], lines)
+    runner.command('pyr.-j throughput 10k records', [sys.executable, PYR, '-j', 'pluck("id", x)'], records)
+    runner.command('pyr.-j -l stream 10k records', [sys.executable, PYR, '-j', '-l', 'x["id"]'], records)
+
+    with tempfile.NamedTemporaryFile(suffix='.txt') as f:
+        f.write(lines)
+        f.flush()
+
+        runner.command('pyr.--file -l 100k lines', [sys.executable, PYR, '--file', f.name, '-l', 'to_snake(x)'])
+        runner.command('pyr.--file -l -b 100k lines', [sys.executable, PYR, '--file', f.name, '-l', '-b', 'len(x)'])
+        runner.command('pyr.-l len 100k lines', [sys.executable, PYR, '-l', 'len(x)'], lines)
+
+        count = ['--file', f.name, '-l', '--reduce', 'count_by(identity, x)', 'to_snake(x)']
+        jobs = str(os.cpu_count())
+        runner.command('pyr.--file --reduce 100k lines', [sys.executable, PYR] + count)
+        runner.command('pyr.--file --reduce --jobs {} 100k lines'.format(jobs), [sys.executable, PYR, '--jobs', jobs] + count)
+
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'importtime': bench_importtime,
+    'curry': bench_curry,
+    'lib': bench_lib,
+    'transduce': bench_transduce,
+    'numpy': bench_numpy,
+    'pmap': bench_pmap,
+    'case': bench_case,
+    'parallel': bench_parallel,
+    'async': bench_async,
+    'pyr': bench_pyr,
+}
+
+
+def save(path, runner):
+    with open(path, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'benchmarks': runner.results,
+        }, f, indent=2)
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as f:
+        old = json.load(f)['benchmarks']
+
+    with open(new_path) as f:
+        new = json.load(f)['benchmarks']
+
+    regressions = 0
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name]['median'] / old[name]['median']
+
+        if ratio > 1 + threshold:
+            label = 'SLOWER'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            label = 'faster'
+        else:
+            label = ''
+
+        print("{:<36} {:>10} -> {:>10}  {:5.2f}x {}".format(
+            name,
+            format_seconds(old[name]['median']),
+            format_seconds(new[name]['median']),
+            ratio,
+            label,
+        ))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark pyr and lib.py")
+    parser.add_argument('benchmarks', nargs='*', help="groups to run: {}".format(', '.join(BENCHMARKS)))
+    parser.add_argument('-n', '--runs', dest='runs', type=int, default=10, help="number of timed runs per benchmark")
+    parser.add_argument('-o', '--output', dest='output', help="write results to a json file")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files")
+    parser.add_argument('--threshold', type=float, default=0.1, help="relative change to flag when comparing")
+
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark group: {}".format(name))
+
+    runner = Runner(args.runs)
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name](runner)
+
+    if args.output:
+        save(args.output, runner)
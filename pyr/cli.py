@@ -0,0 +1,581 @@
+# Everything behind pyr.py, which stays a stub so this gets cached bytecode
+# like any other import instead of being compiled on every run
+
+import re, sys, argparse, os, builtins, marshal, zlib
+from collections import deque
+from functools import lru_cache, partial
+from importlib import import_module
+
+
+class ArgumentParser(argparse.ArgumentParser):
+  # Lets the server send usage and errors back to the client instead of
+  # printing them on its own terminal
+  def __init__(self, *args, stdout=None, stderr=None, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.stdout = stdout
+    self.stderr = stderr
+
+  def _print_message(self, message, file=None):
+    if message:
+      file = (self.stdout if file is sys.stdout else self.stderr) or file or sys.stderr
+      file.write(message)
+
+
+def make_parser(stdout=None, stderr=None):
+  parser = ArgumentParser(description="Manipulate data using ramda functions", stdout=stdout, stderr=stderr)
+  parser.add_argument('-j, --json', dest='json', action='store_true', help="process input as json")
+  parser.add_argument('-l, --line', dest='line', action='store_true', help="process input line by line")
+  parser.add_argument('--jsonl', dest='jsonl', action='store_true', help="process input and output as json lines")
+  parser.add_argument('--stream', dest='stream', action='store_true', help="with -j, parse the top level array lazily (implied by -l)")
+  parser.add_argument('--prefix', dest='prefix', help="with -j, stream the array at this dotted path, e.g. data.items")
+  parser.add_argument('--file', dest='file', help="read input from a file, memory mapping it for -l and --jsonl")
+  parser.add_argument('-b', '--bytes', dest='bytes', action='store_true', help="with --file -l, pass each line as undecoded bytes")
+  parser.add_argument('-u', '--unbuffered', dest='unbuffered', action='store_true', help="flush after every line of output")
+  parser.add_argument('--jobs', dest='jobs', type=int, default=1, help="evaluate lines in N worker processes")
+  parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=1000, help="lines per job when using --jobs")
+  parser.add_argument('--unordered', dest='unordered', action='store_true', help="with --jobs, write results as soon as they're ready")
+  parser.add_argument('--reduce', dest='reduce', help="with -l, reduce the results with this expression, in each worker when using --jobs")
+  parser.add_argument('--merge', dest='merge', help="required with --reduce and --jobs, merges the list of partial results, e.g. combine_all(x) for count_by or group_by")
+  parser.add_argument('--cache-stats', dest='cache_stats', action='store_true', help="print expression cache stats to stderr")
+  parser.add_argument('--serve', dest='serve', action='store_true', help="run a server that pyrc.py can send work to")
+  parser.add_argument('--socket', dest='socket', default=default_socket(), help="unix socket for --serve")
+  parser.add_argument('expression', nargs='?')
+
+  return parser
+
+
+def check_args(parser, args):
+  if args.jobs < 1:
+    parser.error("--jobs must be at least 1")
+
+  if args.chunk_size < 1:
+    parser.error("--chunk-size must be at least 1")
+
+  if not args.line:
+    for flag, given in [('--jobs', args.jobs != 1), ('--unordered', args.unordered), ('--reduce', args.reduce)]:
+      if given:
+        parser.error("{} only works with -l".format(flag))
+
+  # Only the reducer knows how its partial results fit together, e.g. adding
+  # them is right for count_by but not for max
+  if args.reduce and args.jobs > 1 and not args.merge:
+    parser.error("--reduce with --jobs needs --merge, e.g. --merge 'combine_all(x)' for count_by or group_by")
+
+
+def default_socket():
+  # Keep in sync with pyrc.py. Outside XDG_RUNTIME_DIR, the socket gets a
+  # directory of its own that only we can use.
+  return os.environ.get('PYR_SOCKET') or os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or os.path.join(
+      os.environ.get('TMPDIR') or '/tmp',
+      'pyr-{}'.format(os.getuid()),
+    ),
+    'pyr.sock',
+  )
+
+
+def referenced_names(code):
+  # Only globals, since co_names also has attribute names, and looking those
+  # up could import arbitrary modules, e.g. x.this
+  from dis import get_instructions
+
+  names = {
+    instruction.argval
+    for instruction in get_instructions(code)
+    if instruction.opname in ('LOAD_GLOBAL', 'LOAD_NAME')
+  }
+
+  for const in code.co_consts:
+    if hasattr(const, 'co_names'):
+      names |= referenced_names(const)
+
+  return names
+
+
+def load_names(names):
+  namespace = {'re': re, 'sys': sys, 'os': os}
+  names = names - namespace.keys() - set(dir(builtins))
+
+  # Trivial expressions like len(x) don't need lib.py at all
+  if not names:
+    return namespace
+
+  # lib.py lives next to pyr.py, which python puts first on sys.path, so
+  # importing it (rather than exec-ing the source) gets us cached bytecode
+  import lib
+
+  for name in names:
+    if hasattr(lib, name):
+      namespace[name] = getattr(lib, name)
+    else:
+      # Let expressions use any module by name, e.g. math.sqrt(x)
+      try:
+        namespace[name] = import_module(name)
+      except ImportError:
+        pass
+
+  return namespace
+
+
+CACHE_DIR = os.environ.get('PYR_CACHE_DIR') or os.path.join(
+  os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+  'pyr',
+)
+CACHE_SIZE = 1000
+
+# Listing a full cache takes longer than compiling, so only about one miss in
+# this many checks whether it's time to evict
+EVICT_EVERY = 64
+
+cache_stats = {'hits': 0, 'misses': 0}
+
+
+def cache_key(source):
+  # crc32 keeps us from importing hashlib; collisions are caught by storing
+  # the source alongside the code
+  return zlib.crc32(source.encode('utf-8'))
+
+
+def cache_path(key):
+  # Bytecode isn't portable across versions
+  return os.path.join(CACHE_DIR, '{:08x}.{}'.format(key, sys.implementation.cache_tag))
+
+
+def evict_cache():
+  entries = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR)]
+  if len(entries) <= CACHE_SIZE:
+    return
+
+  # Hits don't touch their entry since that costs more than it saves, so this
+  # drops the oldest written rather than the least recently used
+  entries.sort(key=os.path.getmtime)
+  for entry in entries[:len(entries) - CACHE_SIZE]:
+    os.unlink(entry)
+
+
+def compile_code(source):
+  # Returns the names to load along with the code, so hits don't need dis
+  key = cache_key(source)
+  path = cache_path(key)
+
+  # One read and marshal.loads is several times faster than marshal.load,
+  # which reads the file a few bytes at a time
+  try:
+    with open(path, 'rb') as f:
+      cached_source, code, names = marshal.loads(f.read())
+
+    if cached_source == source:
+      cache_stats['hits'] += 1
+
+      return code, names
+  except (OSError, EOFError, ValueError, TypeError):
+    pass
+
+  cache_stats['misses'] += 1
+  code = compile(source, '<pyr>', 'eval')
+  names = referenced_names(code)
+
+  # The cache is best-effort, so don't fail if we can't write to it
+  try:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+      marshal.dump((source, code, names), f)
+
+    os.replace(tmp, path)
+
+    if key % EVICT_EVERY == 0:
+      evict_cache()
+  except OSError:
+    pass
+
+  return code, names
+
+
+def print_cache_stats(stderr):
+  try:
+    entries = os.listdir(CACHE_DIR)
+  except OSError:
+    entries = []
+
+  stderr.write("pyr cache: {} hits, {} misses, {} compiled in memory, {} on disk in {}\n".format(
+    cache_stats['hits'],
+    cache_stats['misses'],
+    compile_expression.cache_info().currsize,
+    len(entries),
+    CACHE_DIR,
+  ))
+
+
+# Bounded so a long-running server doesn't hold on to every expression it's seen
+@lru_cache(maxsize=256)
+def compile_expression(expression):
+  code, names = compile_code("lambda x: {}".format(expression))
+
+  return eval(code, load_names(names))
+
+
+def init_worker(expression, reduce=None):
+  # Compile once per worker rather than shipping the function with each chunk
+  global fn, reducer
+  fn = compile_expression(expression)
+  reducer = compile_expression(reduce) if reduce else None
+
+
+def eval_chunk(chunk):
+  results = (fn(x) for x in chunk)
+
+  # Reduce where the data is, so only the partial result is sent back
+  return [reducer(results)] if reducer else list(results)
+
+
+def eval_range(path, start, end, parse):
+  lines = mmap_lines(path, decode=parse != 'bytes', start=start, end=end)
+
+  if parse == 'json':
+    import json
+
+    lines = (json.loads(line) for line in lines if line.strip())
+
+  return eval_chunk(lines)
+
+
+# Big enough that workers spend their time on lines rather than messages,
+# small enough to spread the work evenly and bound ordered output
+RANGE_SIZE = 1 << 24
+
+
+def file_ranges(path, jobs):
+  import mmap
+
+  with open(path, 'rb') as f:
+    length = os.fstat(f.fileno()).st_size
+    if not length:
+      return
+
+    size = max(1, min(RANGE_SIZE, -(-length // jobs)))
+
+    # Move each boundary to just past a newline so no line is split
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      start = 0
+      while start < length:
+        end = start + size
+        end = data.find(b'\n', end - 1) + 1 or length if end < length else length
+
+        yield start, end
+
+        start = end
+
+
+def parallel_map(expression, reduce, work, tasks, jobs, ordered=True):
+  from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+  # Keep a bounded number of tasks in flight so we don't slurp all of stdin
+  window = jobs * 2
+  pending = deque() if ordered else set()
+
+  def drain():
+    if ordered:
+      yield from pending.popleft().result()
+    else:
+      done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+      pending.clear()
+      pending.update(not_done)
+      for future in done:
+        yield from future.result()
+
+  # Workers compile the expression themselves, so any start method will do.
+  # Forking in particular isn't safe on macOS or from the threaded server.
+  with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(expression, reduce)) as pool:
+    for task in tasks:
+      if len(pending) >= window:
+        yield from drain()
+
+      future = pool.submit(work, *task)
+      if ordered:
+        pending.append(future)
+      else:
+        pending.add(future)
+
+    while pending:
+      yield from drain()
+
+
+class JsonReader(object):
+  # Parses one array element at a time with json's own raw_decode, so only
+  # the current element of a huge document needs to be in memory
+  def __init__(self, file, size=65536):
+    import json
+
+    self.file = file
+    self.size = size
+    self.decoder = json.JSONDecoder()
+    self.whitespace = re.compile(r'[ \t\n\r]*')
+    self.buffer = ''
+    self.pos = 0
+    self.eof = False
+
+  def fill(self):
+    # Read at least as much as we're holding, so a big value gets re-scanned
+    # a logarithmic rather than linear number of times
+    chunk = self.file.read(max(self.size, len(self.buffer) - self.pos))
+    self.eof = not chunk
+    self.buffer = self.buffer[self.pos:] + chunk
+    self.pos = 0
+
+  def peek(self):
+    while True:
+      self.pos = self.whitespace.match(self.buffer, self.pos).end()
+      if self.pos < len(self.buffer) or self.eof:
+        return self.buffer[self.pos:self.pos + 1]
+
+      self.fill()
+
+  def next(self):
+    char = self.peek()
+    self.pos += len(char)
+
+    return char
+
+  def value(self):
+    self.peek()
+
+    while True:
+      try:
+        value, end = self.decoder.raw_decode(self.buffer, self.pos)
+      except ValueError:
+        if self.eof:
+          raise
+
+        self.fill()
+        continue
+
+      # A number cut off by the end of the buffer might continue in the next
+      # read, and raw_decode stops early at e.g. "2.5e" when the exponent was
+      if not self.eof and (end == len(self.buffer) or self.buffer[end] in '.eE+-'):
+        self.fill()
+        continue
+
+      self.pos = end
+
+      return value
+
+  def skip_to(self, prefix):
+    for key in prefix:
+      char = self.next()
+
+      if char == '{':
+        while self.peek() == '"':
+          name = self.value()
+          if self.next() != ':':
+            raise ValueError("Expected ':' in json object")
+
+          if name == key:
+            break
+
+          self.value()
+          if self.peek() == ',':
+            self.next()
+        else:
+          raise ValueError("--prefix key {} not found".format(key))
+      elif char == '[' and key.isdigit():
+        for _ in range(int(key)):
+          if self.peek() == ']':
+            raise ValueError("--prefix index {} out of range".format(key))
+
+          self.value()
+          if self.peek() == ',':
+            self.next()
+      else:
+        raise ValueError("--prefix {} doesn't match the json structure".format('.'.join(prefix)))
+
+  def elements(self, prefix=()):
+    self.skip_to(prefix)
+
+    # Anything but an array gets iterated the way -j always has
+    if self.peek() != '[':
+      yield from self.value()
+      return
+
+    self.next()
+    if self.peek() == ']':
+      return
+
+    while True:
+      yield self.value()
+
+      char = self.next()
+      if char == ']':
+        return
+
+      if char != ',':
+        raise ValueError("Expected ',' or ']' in json array")
+
+
+def mmap_lines(path, decode=True, start=0, end=None):
+  import mmap
+
+  with open(path, 'rb') as f:
+    try:
+      data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+      # Empty files can't be mapped
+      return
+
+  if hasattr(data, 'madvise'):
+    data.madvise(mmap.MADV_SEQUENTIAL)
+
+  # Only the current line is ever copied out of the page cache. readline
+  # does the scanning in C, which beats slicing a memoryview line by line.
+  with data:
+    data.seek(start)
+    readline = data.readline
+    end = len(data) if end is None else end
+
+    while start < end:
+      line = readline()
+      start += len(line)
+      line = line.rstrip(b'\n')
+
+      yield line.decode('utf-8') if decode else line
+
+
+def to_text(value):
+  # Lines from -b are bytes, which str would print as b'...'
+  if isinstance(value, (bytes, bytearray, memoryview)):
+    return str(value, 'utf-8', 'replace')
+
+  return str(value)
+
+
+def json_default(value):
+  # Lets lazy results from -l or imapl and friends, Tables and PMaps be
+  # serialized like the lists and dicts they stand in for
+  if isinstance(value, (bytes, bytearray, memoryview)):
+    return to_text(value)
+
+  if hasattr(value, 'keys'):
+    return dict(value.items())
+
+  return list(value)
+
+
+def run(args, stdin, stdout, stderr):
+  # json is one of the slower imports, so skip it unless we're going to use it
+  if args.json or args.jsonl:
+    import json
+
+  fn = compile_expression(args.expression)
+
+  if args.cache_stats:
+    print_cache_stats(stderr)
+
+  lines = None
+  if args.file and (args.line or args.jsonl) and not args.json:
+    # Let the page cache hold the file rather than copying it onto the heap
+    lines = mmap_lines(args.file, decode=args.jsonl or not args.bytes)
+  elif args.file:
+    stdin = open(args.file, encoding='utf-8')
+
+  if args.json and (args.line or args.stream or args.prefix):
+    input = JsonReader(stdin).elements(args.prefix.split('.') if args.prefix else ())
+  elif args.json:
+    input = json.loads(stdin.read())
+  elif args.jsonl:
+    input = (json.loads(line) for line in lines or stdin if line.strip())
+  elif lines:
+    input = lines
+  elif args.line:
+    # Iterate stdin lazily so memory stays flat and results show up as they're produced
+    input = (line.rstrip('\n') for line in stdin)
+  else:
+    input = stdin.read().strip().split('\n')
+
+  if args.line and args.jobs > 1 and lines:
+    # Workers map their own byte ranges of the file, so we never read it here
+    parse = 'json' if args.jsonl else 'bytes' if args.bytes else 'str'
+    tasks = ((args.file, start, end, parse) for start, end in file_ranges(args.file, args.jobs))
+    result = parallel_map(args.expression, args.reduce, eval_range, tasks, args.jobs, ordered=not args.unordered)
+  elif args.line and args.jobs > 1:
+    import lib
+
+    tasks = ((chunk,) for chunk in lib.ichunk(args.chunk_size, input))
+    result = parallel_map(args.expression, args.reduce, eval_chunk, tasks, args.jobs, ordered=not args.unordered)
+  elif args.line:
+    result = (fn(x) for x in input)
+  else:
+    result = fn(input)
+
+  if args.line and args.reduce and args.jobs > 1:
+    partials = list(result)
+
+    if partials:
+      result = compile_expression(args.merge)(partials)
+    else:
+      result = compile_expression(args.reduce)(iter(()))
+  elif args.line and args.reduce:
+    result = compile_expression(args.reduce)(result)
+
+  # Let expressions use amapl and friends, e.g. amapl(fetch, x, limit=8)
+  if hasattr(result, '__await__'):
+    import asyncio
+
+    result = asyncio.run(result)
+
+  # Reduced results get written whole, like those of a plain expression
+  per_line = args.line and not args.reduce
+
+  write = stdout.write
+
+  if args.json:
+    encode = partial(json.dumps, default=json_default)
+
+    # Write arrays an element at a time, in the same format as json.dumps, so
+    # lazy results never have to be held in memory
+    if isinstance(result, (list, tuple)) or hasattr(result, '__next__'):
+      write('[')
+      for idx, value in enumerate(result):
+        if idx:
+          write(', ')
+
+        write(encode(value))
+
+        if args.unbuffered:
+          stdout.flush()
+
+      write(']\n')
+    else:
+      write(encode(result))
+      write('\n')
+  elif per_line or args.jsonl or hasattr(result, '__iter__'):
+    if args.jsonl and not per_line and (isinstance(result, (dict, str)) or not hasattr(result, '__iter__')):
+      result = [result]
+
+    # Write as we go so lazy results never have to be held in memory
+    encode = partial(json.dumps, default=json_default) if args.jsonl else to_text
+    for value in result:
+      write(encode(value))
+      write('\n')
+
+      if args.unbuffered:
+        stdout.flush()
+  else:
+    write(to_text(result))
+    write('\n')
+
+
+def main():
+  parser = make_parser()
+  args = parser.parse_args()
+
+  if args.serve:
+    from server import serve
+
+    serve(args.socket)
+  elif args.expression is None:
+    parser.error("the following arguments are required: expression")
+  else:
+    check_args(parser, args)
+    run(args, sys.stdin, sys.stdout, sys.stderr)
+
@@ -1,29 +1,53 @@
-import re, itertools, uuid
+import re, itertools, threading, time
 from copy import copy
 from collections import OrderedDict
-from inspect import signature
+from collections.abc import Mapping
+from functools import lru_cache, wraps
 
 
 def curry_n(n, fn, carryover_args=(), carryover_kwargs=()):
-    def _curried(*args, **kwargs):
-        cur_n = len(args) + len(kwargs)
-
-        # Rebuild the carryover dict to avoid mutation
-        combined_args = carryover_args + args
-        combined_kwargs = {}
-        combined_kwargs.update(carryover_kwargs)
-        combined_kwargs.update(kwargs)
+    # Almost every call is fully applied with positional args, so check for
+    # that first and skip building the combined args and kwargs
+    if carryover_kwargs:
+        def _curried(*args, **kwargs):
+            return apply_curried(n, fn, carryover_args, carryover_kwargs, args, kwargs)
+    elif carryover_args:
+        def _curried(*args, **kwargs):
+            if not kwargs and len(args) >= n:
+                return fn(*carryover_args, *args)
+
+            return apply_curried(n, fn, carryover_args, carryover_kwargs, args, kwargs)
+    else:
+        def _curried(*args, **kwargs):
+            if not kwargs and len(args) >= n:
+                return fn(*args)
 
-        if cur_n >= n:
-            return fn(*combined_args, **combined_kwargs)
-        else:
-            return curry_n(n - cur_n, fn, combined_args, combined_kwargs)
+            return apply_curried(n, fn, carryover_args, carryover_kwargs, args, kwargs)
 
     _curried._arity = n
 
+    # Lets callers see what a partial application wraps, e.g. add.c(1)
+    _curried._fn = fn
+    _curried._args = carryover_args
+
     return _curried
 
 
+def apply_curried(n, fn, carryover_args, carryover_kwargs, args, kwargs):
+    cur_n = len(args) + len(kwargs)
+
+    # Rebuild the carryover dict to avoid mutation
+    combined_args = carryover_args + args
+    combined_kwargs = {}
+    combined_kwargs.update(carryover_kwargs)
+    combined_kwargs.update(kwargs)
+
+    if cur_n >= n:
+        return fn(*combined_args, **combined_kwargs)
+    else:
+        return curry_n(n - cur_n, fn, combined_args, combined_kwargs)
+
+
 def curry_n_dec(n):
     def _curry_fn(fn):
         fn.c = curry_n(n, fn)
@@ -33,6 +57,36 @@ def curry_n_dec(n):
     return _curry_fn
 
 
+def curry_n_kw(n, fn, carryover_args=(), carryover_kwargs=()):
+    """
+    curry_n for functions with keyword options, which don't count toward n,
+    so e.g. pmapl.c(fn, jobs=2) still waits for the data
+    """
+    def _curried(*args, **kwargs):
+        combined_kwargs = dict(carryover_kwargs)
+        combined_kwargs.update(kwargs)
+
+        if len(args) >= n:
+            return fn(*carryover_args, *args, **combined_kwargs)
+
+        return curry_n_kw(n - len(args), fn, carryover_args + args, combined_kwargs)
+
+    _curried._arity = n
+    _curried._fn = fn
+    _curried._args = carryover_args
+
+    return _curried
+
+
+def curry_n_kw_dec(n):
+    def _curry_fn(fn):
+        fn.c = curry_n_kw(n, fn)
+
+        return fn
+
+    return _curry_fn
+
+
 def partial(fn, *args, **kwargs):
     def _partialed(*other_args, **other_kwargs):
         return fn(*(args + other_args), **merge(kwargs, other_kwargs))
@@ -41,9 +95,78 @@ def partial(fn, *args, **kwargs):
 
 
 def arity(fn):
+    # inspect drags in ast and dis, so only pay for it when we need it
+    from inspect import signature
+
     return getattr(fn, '_arity', len(signature(fn).parameters))
 
 
+def memoize(maxsize=1024, ttl=None, typed=False):
+    """
+    Caches fn's results by argument, dropping the least recently used once
+    there are more than maxsize and anything older than ttl seconds. Calls
+    with unhashable arguments go straight through. Put it under curry_n_dec
+    so the curried form shares the cache.
+    """
+    def _memoize(fn):
+        cache = OrderedDict()
+        stats = {'hits': 0, 'misses': 0}
+        lock = threading.Lock()
+
+        @wraps(fn)
+        def _memoized(*args, **kwargs):
+            key = args
+            if kwargs:
+                # memoize itself marks where the kwargs start
+                key += (memoize,) + tuple(sorted(kwargs.items()))
+            if typed:
+                key += tuple(type(arg) for arg in args) + tuple(type(v) for v in kwargs.values())
+
+            with lock:
+                try:
+                    entry = cache.get(key)
+                except TypeError:
+                    entry = False
+
+                if entry and (ttl is None or entry[1] > time.monotonic()):
+                    stats['hits'] += 1
+                    cache.move_to_end(key)
+
+                    return entry[0]
+
+            if entry is False:
+                return fn(*args, **kwargs)
+
+            value = fn(*args, **kwargs)
+            expires = None if ttl is None else time.monotonic() + ttl
+
+            with lock:
+                stats['misses'] += 1
+                cache[key] = (value, expires)
+                cache.move_to_end(key)
+
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+
+            return value
+
+        def cache_info():
+            with lock:
+                return merge(stats, {'size': len(cache), 'maxsize': maxsize, 'ttl': ttl})
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                stats.update(hits=0, misses=0)
+
+        _memoized.cache_info = cache_info
+        _memoized.cache_clear = cache_clear
+
+        return _memoized
+
+    return _memoize
+
+
 @curry_n_dec(2)
 def n_ary(arity, fn):
     return lambda *args: fn(*args[:arity])
@@ -63,6 +186,10 @@ def binary(fn):
 
 @curry_n_dec(2)
 def mapl(fn, data):
+    vectorized = vectorized_map(fn, data)
+    if vectorized is not None:
+        return vectorized.tolist()
+
     return (
         {key: fn(value) for key, value in data.items()}
         if type(data) == dict else
@@ -70,8 +197,23 @@ def mapl(fn, data):
     )
 
 
+# Lazy versions of mapl, filterl etc. These work on any iterable and yield
+# as they go, so chaining them doesn't build intermediate lists
+@curry_n_dec(2)
+def imapl(fn, data):
+    for item in data:
+        yield fn(item)
+
+
 @curry_n_dec(2)
 def filterl(fn, data):
+    if type(data) == Table:
+        return data.take(itertools.compress(range(len(data)), data.mask(fn)))
+
+    mask = vectorized_map(fn, data)
+    if mask is not None:
+        return list(itertools.compress(data, mask.tolist()))
+
     return (
         {key: value for key, value in data.items() if fn(value)}
         if type(data) == dict else
@@ -79,8 +221,20 @@ def filterl(fn, data):
     )
 
 
+@curry_n_dec(2)
+def ifilterl(fn, data):
+    for item in data:
+        if fn(item):
+            yield item
+
+
 @curry_n_dec(3)
 def reducel(fn, value, data):
+    if getattr(fn, '_fn', fn) is add and not getattr(fn, '_args', ()):
+        total = vectorized_sum(value, data)
+        if total is not None:
+            return total
+
     for item in data:
         value = fn(value, item)
 
@@ -89,6 +243,13 @@ def reducel(fn, value, data):
 
 @curry_n_dec(2)
 def reject(fn, data):
+    if type(data) == Table:
+        return data.take(idx for idx, m in enumerate(data.mask(fn)) if not m)
+
+    mask = vectorized_map(fn, data)
+    if mask is not None:
+        return list(itertools.compress(data, get_numpy().logical_not(mask).tolist()))
+
     return (
         {key: value for key, value in data.items() if not fn(value)}
         if type(data) == dict else
@@ -96,6 +257,13 @@ def reject(fn, data):
     )
 
 
+@curry_n_dec(2)
+def ireject(fn, data):
+    for item in data:
+        if not fn(item):
+            yield item
+
+
 @curry_n_dec(3)
 def when(test, fn, x):
     return fn(x) if test(x) else x
@@ -114,15 +282,54 @@ def find_index(fn, xs):
             return idx
 
 
+# Tags for hash_key, so e.g. [1, 2] and (1, 2) stay distinct
+HASH_LIST = object()
+HASH_TUPLE = object()
+HASH_DICT = object()
+
+
+def hash_key(x):
+    """
+    x itself if it's hashable, otherwise a hashable stand-in that's equal
+    exactly when the originals are, so dicts and lists from json can go in
+    sets and be used as keys.
+    """
+    try:
+        hash(x)
+
+        return x
+    except TypeError:
+        pass
+
+    if isinstance(x, Mapping):
+        return (HASH_DICT, frozenset((k, hash_key(v)) for k, v in x.items()))
+
+    # Left untagged since a set is equal to the frozenset with its items
+    if isinstance(x, (set, frozenset)):
+        return frozenset(hash_key(v) for v in x)
+
+    if isinstance(x, (list, tuple)):
+        return (HASH_LIST if isinstance(x, list) else HASH_TUPLE, tuple(hash_key(v) for v in x))
+
+    raise TypeError(f"unhashable type: '{type(x).__name__}'")
+
+
 def uniq(data):
-    return list(set(data))
+    # Falling back means going through data twice
+    if not isinstance(data, list):
+        data = list(data)
+
+    try:
+        return list(dict.fromkeys(data))
+    except TypeError:
+        return uniq_by(identity, data)
 
 
 @curry_n_dec(2)
 def uniq_by(fn, data):
     result = OrderedDict()
     for item in data:
-        key = fn(item)
+        key = hash_key(fn(item))
         result.setdefault(key, item)
 
     return list(result.values())
@@ -191,13 +398,79 @@ def prop(prop_name, obj):
 
 @curry_n_dec(2)
 def path(_path, obj):
-    while _path:
-        head, *_path = _path
+    return compile_path(tuple(_path))(obj)
+
+
+def path_slow(_path, obj):
+    for head in _path:
+        # prop on None is always None unless you ask for a dunder, so skip
+        # the exception it would take to find that out
+        if obj is None and not (type(head) == str and head.startswith('__')):
+            continue
+
         obj = prop(head, obj)
 
     return obj
 
 
+PATH_TEMPLATES = {}
+
+
+def path_template(depth):
+    """
+    Generate a function that builds getters for paths of a given depth.
+    They index straight through, e.g. obj = obj[k0], handle a failed hop the
+    way prop does, and hand whatever is left of the path to path_slow.
+    """
+    if depth not in PATH_TEMPLATES:
+        keys = ['k{}'.format(idx) for idx in range(depth)]
+        lines = [
+            'def make(slow, {}):'.format(', '.join(['_path'] + keys)),
+            '    def get(obj):',
+        ]
+
+        for idx, key in enumerate(keys):
+            lines.extend([
+                '        try:',
+                '            obj = obj[{}]'.format(key),
+                '        except (IndexError, KeyError):',
+                '            return slow(_path[{}:], None)'.format(idx + 1),
+                '        except TypeError:',
+                '            return slow(_path[{}:], getattr(obj, {}, None))'.format(idx + 1, key),
+            ])
+
+        lines.extend([
+            '        return obj',
+            '    return get',
+        ])
+
+        namespace = {}
+        exec('\n'.join(lines), namespace)
+        PATH_TEMPLATES[depth] = namespace['make']
+
+    return PATH_TEMPLATES[depth]
+
+
+@lru_cache(maxsize=1024)
+def compile_path(_path):
+    """
+    Getter equivalent to path.c(_path), cached by the path tuple
+    """
+    return path_template(len(_path))(path_slow, _path, *_path)
+
+
+def path_c(*args, **kwargs):
+    # path.c(_path) is how path is used most of the time, e.g. with mapl or
+    # group_by, so skip the curried wrapper and hand back the compiled getter
+    if len(args) == 1 and not kwargs:
+        return compile_path(tuple(args[0]))
+
+    return curry_n(2, path)(*args, **kwargs)
+
+
+path.c = path_c
+
+
 @curry_n_dec(3)
 def prop_eq(prop_name, val, obj):
     return prop(prop_name, obj) == val
@@ -213,22 +486,36 @@ def concat(*l):
     return [item for sublist in l for item in sublist]
 
 
+@curry_n_dec(2)
+def iconcat(*l):
+    return itertools.chain.from_iterable(l)
+
+
 def flatten(l):
-    if not hasattr(l, '__iter__') or isinstance(l, (dict, str)):
-        return [l]
+    return list(iflatten(l))
 
-    r = []
-    for x in l:
-        r.extend(flatten(x))
 
-    return r
+def iflatten(l):
+    if not hasattr(l, '__iter__') or isinstance(l, (dict, str)):
+        yield l
+        return
+
+    # Keep our own stack of iterators rather than nesting generators
+    stack = [iter(l)]
+    while stack:
+        for x in stack[-1]:
+            if hasattr(x, '__iter__') and not isinstance(x, (dict, str)):
+                stack.append(iter(x))
+                break
+
+            yield x
+        else:
+            stack.pop()
 
 
 @curry_n_dec(2)
 def without(sans, target):
-    sans = set(sans)
-
-    return [element for element in target if element not in sans]
+    return difference(target, sans)
 
 
 @curry_n_dec(2)
@@ -261,6 +548,9 @@ def merge_all(dicts):
 
 @curry_n_dec(2)
 def merge(*dicts):
+    if dicts and type(dicts[0]) == PMap:
+        return dicts[0].update(*dicts[1:])
+
     result = {}
     for d in dicts:
         result.update(d)
@@ -284,6 +574,12 @@ def pick(keys, data):
 
 @curry_n_dec(2)
 def omit(keys, data):
+    if type(data) == PMap:
+        for key in keys:
+            data = data.delete(key)
+
+        return data
+
     result = {}
     for key, value in data.items():
         if key in keys:
@@ -296,6 +592,9 @@ def omit(keys, data):
 
 @curry_n_dec(3)
 def assoc(key, value, data):
+    if type(data) == PMap:
+        return data.set(key, value)
+
     result = copy(data)
 
     if type(data) == dict:
@@ -308,24 +607,66 @@ def assoc(key, value, data):
 
 @curry_n_dec(3)
 def assoc_path(_path, value, data):
-    if not hasattr(data, '__setitem__'):
-        data = {}
+    return compile_path_setter(tuple(_path))(value, data)
 
-    head, *tail = _path
 
-    value = assoc_path(tail, value, data.get(head, {})) if tail else value
+@lru_cache(maxsize=1024)
+def compile_path_setter(_path):
+    """
+    Setter equivalent to assoc_path.c(_path), cached by the path tuple
+    """
+    parent_keys = _path[:-1]
 
-    result = copy(data)
-    result[head] = value
+    def setter(value, data):
+        # Walk down once, then copy each level on the way back up. PMaps
+        # stay PMaps, and anything missing under one is created as one.
+        nodes = []
+        for key in parent_keys:
+            if type(data) == PMap:
+                nodes.append(data)
+                data = data.get(key, PMap())
+                continue
 
-    return result
+            if not hasattr(data, '__setitem__'):
+                data = {}
+
+            nodes.append(data)
+            data = data.get(key, {})
+
+        if type(data) != PMap and not hasattr(data, '__setitem__'):
+            data = {}
+
+        nodes.append(data)
+
+        for node, key in zip(reversed(nodes), reversed(_path)):
+            if type(node) == PMap:
+                value = node.set(key, value)
+            else:
+                result = copy(node)
+                result[key] = value
+                value = result
+
+        return value
+
+    return setter
 
 
 @curry_n_dec(2)
 def pluck(key, coll):
+    if type(coll) == Table:
+        return coll.column(key)
+
     return mapl(prop.c(key), coll)
 
 
+@curry_n_dec(2)
+def ipluck(key, coll):
+    if type(coll) == Table:
+        return iter(coll.column(key))
+
+    return imapl(prop.c(key), coll)
+
+
 @curry_n_dec(2)
 def all_fn(fn, coll):
     for x in coll:
@@ -373,6 +714,9 @@ def where_eq(spec, obj):
 
 @curry_n_dec(2)
 def group_by(fn, coll):
+    if type(coll) == Table and getattr(fn, '_fn', None) is prop and len(fn._args) == 1:
+        return coll.group(fn._args[0])
+
     result = {}
     for item in coll:
         key = fn(item)
@@ -393,6 +737,184 @@ def count_by(fn, coll):
     return result
 
 
+def combine(a, b):
+    """
+    Merges two partial results of the same shape into the result for both,
+    e.g. the count_by or group_by of two halves of the data. Numbers add,
+    lists concatenate, sets union and dicts combine key by key.
+    """
+    if isinstance(a, Mapping):
+        result = dict(a)
+        for key, value in b.items():
+            result[key] = combine(result[key], value) if key in result else value
+
+        return result
+
+    if isinstance(a, (set, frozenset)):
+        return a | b
+
+    return a + b
+
+
+def combine_all(partials):
+    """
+    combine for any number of partials. Their dicts, lists and sets are
+    extended in place rather than copied for each merge, so only pass
+    results that nothing else holds on to.
+    """
+    partials = iter(partials)
+    result = next(partials, None)
+
+    for partial in partials:
+        result = combine_into(result, partial)
+
+    return result
+
+
+def combine_into(result, value):
+    if isinstance(result, dict):
+        for key, member in value.items():
+            result[key] = combine_into(result[key], member) if key in result else member
+
+        return result
+
+    if isinstance(result, list):
+        result.extend(value)
+    elif isinstance(result, set):
+        result |= value
+    else:
+        result = combine(result, value)
+
+    return result
+
+
+# Pools are expensive to start, so parallel helpers share one per
+# (threads, jobs) for the life of the process
+EXECUTORS = {}
+
+
+def get_executor(jobs=None, threads=False):
+    key = (threads, jobs)
+
+    if key not in EXECUTORS:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        if threads:
+            EXECUTORS[key] = ThreadPoolExecutor(jobs)
+        else:
+            EXECUTORS[key] = ProcessPoolExecutor(jobs)
+
+    return EXECUTORS[key]
+
+
+def pickled(*objs):
+    import pickle
+
+    try:
+        return pickle.dumps(objs)
+    except Exception:
+        return None
+
+
+def set_parallel_fn(fn):
+    global PARALLEL_FN
+    PARALLEL_FN = fn
+
+
+def call_parallel_fn(work, chunk, *args):
+    return work(PARALLEL_FN, chunk, *args)
+
+
+def reduce_chunk(fn, chunk, value):
+    return reducel(fn, value, chunk)
+
+
+def run_chunks(work, fn, data, args=(), jobs=None, chunk_size=None, threads=False):
+    """
+    work(fn, chunk, *args) for chunks of data, run on a pool, with the
+    results in the order of the chunks. Without fork, lambdas and closures
+    run on threads instead.
+    """
+    import os
+    from itertools import repeat
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    from multiprocessing import get_start_method
+
+    data = data if isinstance(data, list) else list(data)
+    jobs = jobs or os.cpu_count()
+
+    if jobs == 1:
+        return [work(fn, data, *args)] if data else []
+
+    chunk_size = chunk_size or max(1, -(-len(data) // (jobs * 4)))
+    chunks = [data[idx:idx + chunk_size] for idx in range(0, len(data), chunk_size)]
+    extra = [repeat(arg) for arg in args]
+
+    if len(chunks) <= 1:
+        return [work(fn, chunk, *args) for chunk in chunks]
+
+    if threads:
+        return list(get_executor(jobs, threads=True).map(work, repeat(fn), chunks, *extra))
+
+    payload = pickled(fn, args)
+    forks = get_start_method() == 'fork'
+
+    if payload is None or (forks and b'__main__' in payload):
+        # Lambdas and closures can't be sent to a running pool, nor can anything
+        # new in __main__ once it has forked, but a fresh fork inherits them.
+        # Spawned workers re-import __main__, so they only miss the former.
+        if not forks:
+            return list(get_executor(jobs, threads=True).map(work, repeat(fn), chunks, *extra))
+
+        with ProcessPoolExecutor(jobs, initializer=set_parallel_fn, initargs=(fn,)) as pool:
+            return list(pool.map(call_parallel_fn, repeat(work), chunks, *extra))
+
+    try:
+        return list(get_executor(jobs).map(work, repeat(fn), chunks, *extra))
+    except BrokenProcessPool:
+        # A dead worker breaks the pool for good, so start a new one next time
+        EXECUTORS.pop((False, jobs), None)
+        raise
+
+
+@curry_n_kw_dec(2)
+def pmapl(fn, data, jobs=None, chunk_size=None, threads=False):
+    # Like mapl, map a dict's values and keep its keys
+    if type(data) == dict:
+        return dict(zip(data, pmapl(fn, list(data.values()), jobs, chunk_size, threads)))
+
+    return list(itertools.chain.from_iterable(
+        run_chunks(mapl, fn, data, jobs=jobs, chunk_size=chunk_size, threads=threads)
+    ))
+
+
+@curry_n_kw_dec(3)
+def preduce(fn, value, data, merge=None, jobs=None, chunk_size=None, threads=False):
+    """
+    reducel over chunks of data in parallel, with the partial results merged
+    in order using merge, or fn itself. value has to be an identity for the
+    merge, like 0 for add, since every chunk starts from it.
+    """
+    partials = run_chunks(reduce_chunk, fn, data, (value,), jobs=jobs, chunk_size=chunk_size, threads=threads)
+
+    return reducel(merge or fn, value, partials)
+
+
+@curry_n_kw_dec(2)
+def pgroup_by(fn, coll, jobs=None, chunk_size=None, threads=False):
+    partials = run_chunks(group_by, fn, coll, jobs=jobs, chunk_size=chunk_size, threads=threads)
+
+    return combine_all(partials) or {}
+
+
+@curry_n_kw_dec(2)
+def pcount_by(fn, coll, jobs=None, chunk_size=None, threads=False):
+    partials = run_chunks(count_by, fn, coll, jobs=jobs, chunk_size=chunk_size, threads=threads)
+
+    return combine_all(partials) or {}
+
+
 def pipe(*fns):
     def _piped(value):
         for fn in fns:
@@ -403,36 +925,437 @@ def pipe(*fns):
     return _piped
 
 
+# Async helpers. Functions passed to these can be coroutine functions or
+# plain ones, and asyncio is only imported once one of them runs.
+
+
+async def await_result(fn, value):
+    result = fn(value)
+
+    if hasattr(result, '__await__'):
+        result = await result
+
+    return result
+
+
+async def amap_pairs(fn, data, limit):
+    """
+    (item, fn(item)) for each item of data, which may be an async iterable,
+    in order. At most limit calls run at once, and items are only pulled from
+    data as fast as they can be handled.
+    """
+    import asyncio
+
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit}")
+
+    queue = asyncio.Queue(limit)
+    results = {}
+    items = []
+
+    async def produce():
+        if hasattr(data, '__aiter__'):
+            async for item in data:
+                items.append(item)
+                await queue.put((len(items) - 1, item))
+        else:
+            for item in data:
+                items.append(item)
+                await queue.put((len(items) - 1, item))
+
+        for _ in range(limit):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            task = await queue.get()
+            if task is None:
+                return
+
+            idx, item = task
+            results[idx] = await await_result(fn, item)
+
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(work()) for _ in range(limit)]
+
+    # Don't leave the other workers running if one of them fails
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return [(item, results[idx]) for idx, item in enumerate(items)]
+
+
+@curry_n_kw_dec(2)
+async def amapl(fn, data, limit=16):
+    return [result for item, result in await amap_pairs(fn, data, limit)]
+
+
+@curry_n_kw_dec(2)
+async def afilterl(fn, data, limit=16):
+    return [item for item, keep in await amap_pairs(fn, data, limit) if keep]
+
+
+def apipe(*fns):
+    """
+    pipe for coroutine functions, e.g. amapl(apipe(fetch, parse), ids) runs
+    the whole pipeline for up to 16 ids at once.
+    """
+    async def _piped(value):
+        for fn in fns:
+            value = await await_result(fn, value)
+
+        return value
+
+    return _piped
+
+
+# Transducers. Each x* function wraps a reducing step (acc, item) -> acc, so
+# a pipeline composed with xpipe does all of its stages in one pass per item
+# without building a list between them. Finish with transduce, or feed xseq
+# into any reducer, e.g. group_by(h, xseq(xpipe(xfilter(f), xmap(g)), coll))
+#
+# The built in stages also describe themselves in _stages, which transduce
+# and xseq use to generate a single loop with no per-stage function calls.
+# Custom transducers work too, they just go through the slower step path.
+
+
+class Reduced(object):
+    """
+    Returned by a step to stop transduce early, e.g. by xtake
+    """
+    def __init__(self, value):
+        self.value = value
+
+
+def xmap(fn):
+    def _xform(step):
+        def _step(acc, item):
+            return step(acc, fn(item))
+
+        return _step
+
+    _xform._stages = (('map', fn),)
+
+    return _xform
+
+
+def xfilter(fn):
+    def _xform(step):
+        def _step(acc, item):
+            return step(acc, item) if fn(item) else acc
+
+        return _step
+
+    _xform._stages = (('filter', fn),)
+
+    return _xform
+
+
+def xreject(fn):
+    def _xform(step):
+        def _step(acc, item):
+            return acc if fn(item) else step(acc, item)
+
+        return _step
+
+    _xform._stages = (('reject', fn),)
+
+    return _xform
+
+
+def xtake(n):
+    def _xform(step):
+        # State lives here so every transduce call gets its own count
+        remaining = [n]
+
+        def _step(acc, item):
+            if remaining[0] <= 0:
+                return Reduced(acc)
+
+            remaining[0] -= 1
+            acc = step(acc, item)
+
+            return Reduced(acc) if remaining[0] <= 0 else acc
+
+        return _step
+
+    _xform._stages = (('take', n),)
+
+    return _xform
+
+
+def xuniq_by(fn):
+    def _xform(step):
+        seen = set()
+
+        def _step(acc, item):
+            key = fn(item)
+            if key in seen:
+                return acc
+
+            seen.add(key)
+
+            return step(acc, item)
+
+        return _step
+
+    _xform._stages = (('uniq_by', fn),)
+
+    return _xform
+
+
+def xpipe(*xforms):
+    def _xform(step):
+        # Wrap from the end so items hit the first stage first
+        for xform in reversed(xforms):
+            step = xform(step)
+
+        return step
+
+    if all(hasattr(xform, '_stages') for xform in xforms):
+        _xform._stages = tuple(stage for xform in xforms for stage in xform._stages)
+
+    return _xform
+
+
+FUSED_LOOPS = {}
+
+
+def fused_loop(kinds, terminal):
+    """
+    Generate a function running the given stage kinds in one loop. For
+    terminal 'yield' it's a generator of the items that make it through,
+    for 'reduce' it folds them with fn the way transduce does.
+    """
+    cache_key = (kinds, terminal)
+    if cache_key in FUSED_LOOPS:
+        return FUSED_LOOPS[cache_key]
+
+    setup = ['stop = False']
+    body = []
+    indent = '        '
+
+    for idx, kind in enumerate(kinds):
+        arg = 'a{}'.format(idx)
+
+        if kind == 'map':
+            body.append(indent + 'item = {}(item)'.format(arg))
+        elif kind == 'filter':
+            body.append(indent + 'if {}(item):'.format(arg))
+            indent += '    '
+        elif kind == 'reject':
+            body.append(indent + 'if not {}(item):'.format(arg))
+            indent += '    '
+        elif kind == 'uniq_by':
+            setup.append('seen{} = set()'.format(idx))
+            body.append(indent + 'key = {}(item)'.format(arg))
+            body.append(indent + 'if key not in seen{}:'.format(idx))
+            indent += '    '
+            body.append(indent + 'seen{}.add(key)'.format(idx))
+        elif kind == 'take':
+            # Stop after the nth item rather than pulling one more to find out
+            setup.append('taken{} = 0'.format(idx))
+            setup.append('stop = stop or {} <= 0'.format(arg))
+            body.append(indent + 'if taken{} < {}:'.format(idx, arg))
+            indent += '    '
+            body.append(indent + 'taken{} += 1'.format(idx))
+            body.append(indent + 'stop = stop or taken{} >= {}'.format(idx, arg))
+
+    if terminal == 'yield':
+        body.append(indent + 'yield item')
+        done = 'return'
+    else:
+        body.append(indent + 'value = fn(value, item)')
+        body.append(indent + 'if type(value) is Reduced:')
+        body.append(indent + '    return value.value')
+        done = 'return value'
+
+    args = ''.join(', a{}'.format(idx) for idx in range(len(kinds)))
+    source = '\n'.join([
+        'def _fused(fn, value, data{}):'.format(args),
+        *('    ' + line for line in setup),
+        '    if stop:',
+        '        ' + done,
+        '    for item in data:',
+        *body,
+        '        if stop:',
+        '            ' + done,
+        '    ' + done,
+    ])
+
+    namespace = {'Reduced': Reduced}
+    exec(source, namespace)
+    FUSED_LOOPS[cache_key] = namespace['_fused']
+
+    return namespace['_fused']
+
+
+@curry_n_dec(4)
+def transduce(xform, fn, value, data):
+    stages = getattr(xform, '_stages', None)
+    if stages is not None:
+        loop = fused_loop(tuple(kind for kind, _ in stages), 'reduce')
+
+        return loop(fn, value, data, *(arg for _, arg in stages))
+
+    step = xform(fn)
+
+    for item in data:
+        value = step(value, item)
+
+        if type(value) is Reduced:
+            return value.value
+
+    return value
+
+
+@curry_n_dec(2)
+def xseq(xform, data):
+    stages = getattr(xform, '_stages', None)
+    if stages is not None:
+        loop = fused_loop(tuple(kind for kind, _ in stages), 'yield')
+
+        return loop(None, None, data, *(arg for _, arg in stages))
+
+    return xseq_steps(xform, data)
+
+
+def xseq_steps(xform, data):
+    # The final step collects what reaches it, since a stage may pass along
+    # any number of items per input
+    buffer = []
+
+    def append(acc, item):
+        buffer.append(item)
+
+        return acc
+
+    step = xform(append)
+
+    for item in data:
+        result = step(None, item)
+
+        yield from buffer
+        buffer.clear()
+
+        if type(result) is Reduced:
+            return
+
+
 def invoker(arity, method_name):
     @curry_n_dec(arity)
     def invoke(*args):
         obj = args[-1]
         method = getattr(obj, method_name)
 
-        return method(args[:-1])
+        return method(args[:-1])
+
+    return invoke
+
+
+@curry_n_dec(3)
+def replace(find, replace, value):
+    return value.replace(find, replace)
+
+
+def reverse(xs):
+    return list(reversed(xs))
+
+
+def always(val):
+    return lambda *args, **kwargs: val
+
+
+def identity(val):
+    return val
+
+
+# Set operations keep the order of their first argument. difference and
+# intersection filter it, so its duplicates are kept, while union and uniq
+# drop them. Unhashable items are compared by hash_key.
+
+
+@curry_n_dec(2)
+def difference(l1, l2):
+    # Both may be iterated again if we fall back
+    if not isinstance(l1, list):
+        l1 = list(l1)
+
+    if not isinstance(l2, list):
+        l2 = list(l2)
+
+    try:
+        exclude = set(l2)
+
+        return [item for item in l1 if item not in exclude]
+    except TypeError:
+        return difference_by(identity, l1, l2)
+
+
+@curry_n_dec(3)
+def difference_by(fn, l1, l2):
+    exclude = {hash_key(fn(item)) for item in l2}
+
+    return [item for item in l1 if hash_key(fn(item)) not in exclude]
+
+
+@curry_n_dec(2)
+def intersection(l1, l2):
+    # Both may be iterated again if we fall back
+    if not isinstance(l1, list):
+        l1 = list(l1)
+
+    if not isinstance(l2, list):
+        l2 = list(l2)
+
+    try:
+        include = set(l2)
+
+        return [item for item in l1 if item in include]
+    except TypeError:
+        return intersection_by(identity, l1, l2)
+
+
+@curry_n_dec(3)
+def intersection_by(fn, l1, l2):
+    include = {hash_key(fn(item)) for item in l2}
 
-    return invoke
+    return [item for item in l1 if hash_key(fn(item)) in include]
 
 
-@curry_n_dec(3)
-def replace(find, replace, value):
-    return value.replace(find, replace)
+@curry_n_dec(2)
+def union(l1, l2):
+    return uniq(itertools.chain(l1, l2))
 
 
-def reverse(xs):
-    return list(reversed(xs))
+@curry_n_dec(3)
+def union_by(fn, l1, l2):
+    return uniq_by(fn, itertools.chain(l1, l2))
 
 
-def always(val):
-    return lambda *args, **kwargs: val
+def dupes(data):
+    return dupes_by(identity, data)
 
 
-def identity(val):
-    return val
+@curry_n_dec(2)
+def dupes_by(fn, data):
+    """
+    The first item for each key that shows up more than once, in the order
+    the repeats are found
+    """
+    seen = {}
+    result = {}
+    for item in data:
+        key = hash_key(fn(item))
 
+        if key in seen:
+            result.setdefault(key, seen[key])
+        else:
+            seen[key] = item
 
-def difference(l1, l2):
-    return [item for item in l1 if item not in l2]
+    return list(result.values())
 
 
 @curry_n_dec(3)
@@ -459,6 +1382,109 @@ def subtract(x, y):
     return x - y
 
 
+# Optional numpy backend. Big homogeneous lists of ints or floats passed to
+# mapl, filterl, reject or reducel with one of these functions get handed
+# to numpy instead of going through a python call per item. Results are
+# converted back to plain python values, and anything numpy might do
+# differently from python (overflow, mixed int/float comparisons) falls
+# back to the normal path. numpy is only imported once a list is big enough.
+VECTORIZED = {
+    add: 'add',
+    subtract: 'subtract',
+    lt: 'less',
+    lte: 'less_equal',
+    gt: 'greater',
+    gte: 'greater_equal',
+}
+
+# Below this numpy's conversion overhead outweighs the speedup, see
+# `bench.py numpy` for the crossover on your machine
+NUMPY_MIN_SIZE = 1000
+
+# Keep clear of int64 limits so numpy can't overflow where python wouldn't
+NUMPY_MAX_INT = 2 ** 61
+
+NUMPY = {}
+
+
+def get_numpy():
+    if 'module' not in NUMPY:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+
+        NUMPY['module'] = numpy
+
+    return NUMPY['module']
+
+
+def numeric_array(data):
+    if type(data) != list or len(data) < NUMPY_MIN_SIZE:
+        return None
+
+    # bools are ints, but we want to leave them alone
+    kinds = set(map(type, data))
+    if kinds != {int} and kinds != {float}:
+        return None
+
+    np = get_numpy()
+    if np is None:
+        return None
+
+    try:
+        array = np.array(data)
+    except OverflowError:
+        return None
+
+    if array.dtype.kind == 'i' and (array.min() < -NUMPY_MAX_INT or array.max() > NUMPY_MAX_INT):
+        return None
+
+    return array if array.dtype.kind in 'if' else None
+
+
+def vectorized_map(fn, data):
+    ufunc = VECTORIZED.get(getattr(fn, '_fn', None))
+    args = getattr(fn, '_args', ())
+    if ufunc is None or len(args) != 1 or type(args[0]) not in (int, float):
+        return None
+
+    array = numeric_array(data)
+    if array is None:
+        return None
+
+    scalar = args[0]
+    element_type = int if array.dtype.kind == 'i' else float
+
+    # Python compares ints and floats exactly, numpy converts to float first
+    if ufunc not in ('add', 'subtract') and type(scalar) != element_type:
+        return None
+
+    if type(scalar) == int and abs(scalar) > NUMPY_MAX_INT:
+        return None
+
+    return getattr(get_numpy(), ufunc)(scalar, array)
+
+
+def vectorized_sum(value, data):
+    if type(data) != list or len(data) < NUMPY_MIN_SIZE or type(value) not in (int, float):
+        return None
+
+    # ints add exactly, so the builtin sum gives the same answer as reducel
+    # without even needing numpy
+    if type(value) == int and set(map(type, data)) == {int}:
+        return sum(data, value)
+
+    array = numeric_array(data)
+    if array is None or array.dtype.kind != 'f' or float(value) != value:
+        return None
+
+    # cumsum adds left to right like reducel, np.sum would round differently
+    np = get_numpy()
+
+    return float(np.cumsum(np.concatenate(([value], array)))[-1])
+
+
 @curry_n_dec(2)
 def obj_of(k, v):
     return {k: v}
@@ -483,6 +1509,8 @@ def first(xs):
 
 
 def uuid_str():
+    import uuid
+
     return str(uuid.uuid4())
 
 
@@ -519,22 +1547,33 @@ def concat_all(lists):
 
 
 def group_by_key(key, items):
+    if type(items) == Table:
+        return items.group(key)
+
     return group_by(prop.c(key), items)
 
 
 def diff_collections(old, new):
+    # Index by id up front so this is linear rather than a find per item.
+    # setdefault keeps the first item for an id, same as find would.
+    old_by_id = {}
+    for old_item in old:
+        old_by_id.setdefault(old_item['id'], old_item)
+
+    new_ids = set(new_item['id'] for new_item in new)
+
     diff = {
         'added': [],
         'changed': [],
         # Anything in old that's gone in new
         'removed': [
             old_item for old_item in old
-            if not find(prop_eq.c('id', old_item['id']), new)
+            if old_item['id'] not in new_ids
         ],
     }
 
     for new_item in new:
-        old_item = find(prop_eq.c('id', new_item['id']), old)
+        old_item = old_by_id.get(new_item['id'])
 
         # Anything in new that's gone in old
         if not old_item:
@@ -549,6 +1588,29 @@ def diff_collections(old, new):
     return diff
 
 
+def idiff_collections(old, new):
+    """
+    Like diff_collections, but takes two iterables sorted by id and yields
+    ('added' | 'changed' | 'removed', item) pairs in a single merge pass, so
+    neither side has to fit in memory.
+    """
+    old, new = iter(old), iter(new)
+    old_item, new_item = next(old, None), next(new, None)
+
+    while old_item is not None or new_item is not None:
+        if new_item is None or (old_item is not None and old_item['id'] < new_item['id']):
+            yield 'removed', old_item
+            old_item = next(old, None)
+        elif old_item is None or new_item['id'] < old_item['id']:
+            yield 'added', new_item
+            new_item = next(new, None)
+        else:
+            if new_item != old_item:
+                yield 'changed', {'from': old_item, 'to': new_item}
+
+            old_item, new_item = next(old, None), next(new, None)
+
+
 def diff_dicts(a, b):
     diff = []
 
@@ -565,21 +1627,86 @@ def diff_dicts(a, b):
     return diff
 
 
-def convert_leaves(value, from_type, convert):
-    if isinstance(value, list):
-        return [convert_leaves(member, from_type, convert) for member in value]
-    elif isinstance(value, dict):
-        return {
-            key: convert_leaves(member, from_type, convert)
-            for key, member in value.items()
-        }
-    elif isinstance(value, from_type):
-        return convert(value)
-    else:
-        return value
+def walk_tree(value, leaf=None, key=None, in_place=False):
+    """
+    Rebuilds nested lists and dicts, applying leaf to everything else and key
+    to dict keys. Keeps its own stack so depth is only limited by memory.
+    With in_place, containers are updated instead of copied, for when the
+    caller owns the data.
+    """
+    if not isinstance(value, (list, dict)):
+        return leaf(value) if leaf else value
+
+    root = value if in_place else [] if isinstance(value, list) else {}
+
+    # Children are linked into their parent before they're filled in, so the
+    # order we pop them in doesn't matter
+    stack = [(value, root)]
+    seen = {id(value)}
+
+    def descend(member):
+        if not in_place:
+            child = [] if isinstance(member, list) else {}
+            stack.append((member, child))
+
+            return child
+
+        # A container that's reachable twice must only be transformed once
+        if id(member) not in seen:
+            seen.add(id(member))
+            stack.append((member, member))
+
+        return member
+
+    while stack:
+        source, target = stack.pop()
+
+        if isinstance(source, list):
+            if target is not source:
+                target[:] = source
+
+            for idx, member in enumerate(source):
+                if isinstance(member, (list, dict)):
+                    target[idx] = descend(member)
+                elif leaf:
+                    target[idx] = leaf(member)
+        else:
+            items = source.items()
+
+            # Renaming keys in place means starting the dict over
+            if in_place and key:
+                items = list(items)
+                source.clear()
+
+            for k, member in items:
+                if key:
+                    k = key(k)
+
+                if isinstance(member, (list, dict)):
+                    member = descend(member)
+                elif leaf:
+                    member = leaf(member)
+
+                target[k] = member
+
+    return root
+
+
+def convert_leaves(value, from_type, convert, in_place=False):
+    def leaf(member):
+        return convert(member) if isinstance(member, from_type) else member
+
+    return walk_tree(value, leaf=leaf, in_place=in_place)
 
 
 def safe_divide(x, y):
+    # numpy arrays divide elementwise, with 0.0 wherever y is 0
+    if hasattr(x, '__array__') or hasattr(y, '__array__'):
+        np = get_numpy()
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+        return np.divide(x, y, out=np.zeros(np.broadcast(x, y).shape), where=y != 0)
+
     return x / y if y != 0 else 0.0
 
 
@@ -591,8 +1718,11 @@ def is_not_none(x):
     return x is not None
 
 
+DIGITS = re.compile('[0-9]+$')
+
+
 def is_digits(x):
-    return re.search("^[0-9]+$", x) is not None
+    return DIGITS.match(x) is not None
 
 
 def slurp(path, mode="r"):
@@ -603,17 +1733,34 @@ def slurp(path, mode="r"):
 
 
 def get_subset_of(a, b):
-    if isinstance(a, list) and isinstance(b, list):
-        return mapl(partial(get_subset_of, first(a)), b)
-
     def recursible(v):
         return isinstance(v, dict) or (
             isinstance(v, list) and isinstance(first(v), dict))
 
-    return {
-        k: v if not recursible(v) else get_subset_of(a[k], v)
-        for k, v in b.items()
-        if k in a}
+    # Walk a and b together with our own stack, like walk_tree, filling in
+    # result slots as we go
+    result = [None]
+    stack = [(a, b, result, 0)]
+    while stack:
+        a, b, target, slot = stack.pop()
+
+        if isinstance(a, list) and isinstance(b, list):
+            a = first(a)
+            target[slot] = subset = [None] * len(b)
+
+            for idx, v in enumerate(b):
+                stack.append((a, v, subset, idx))
+        else:
+            target[slot] = subset = {}
+
+            for k, v in b.items():
+                if k in a:
+                    subset[k] = v
+
+                    if recursible(v):
+                        stack.append((a[k], v, subset, k))
+
+    return result[0]
 
 
 @curry_n_dec(2)
@@ -623,6 +1770,9 @@ def create_map(key, collection):
 
 @curry_n_dec(3)
 def create_map_of(key, value_key, collection):
+    if type(collection) == Table:
+        return dict(zip(collection.column(key), collection.column(value_key)))
+
     result = {}
     for item in collection:
         result[prop(key, item)] = prop(value_key, item)
@@ -689,19 +1839,22 @@ def rename_path(from_path, to_path, data):
     value = path(from_path, data)
 
     # Remove it from the data structure
-    update_path(from_path[:-1], omit.c(from_path[-1]), data)
+    if len(from_path) > 1:
+        data = update_path(from_path[:-1], omit.c([from_path[-1]]), data)
+    else:
+        data = omit(from_path, data)
 
     # Stick it where it belongs
     return assoc_path(to_path, value, data)
 
 
 @curry_n_dec(3)
-def update_path(path, fn, data):
-    value = path(path, data)
-    parent = path(path[:-1], data) if len(path) > 1 else data
+def update_path(_path, fn, data):
+    value = path(_path, data)
+    parent = path(_path[:-1], data) if len(_path) > 1 else data
     args = [value, parent, data][:arity(fn)]
 
-    return assoc_path(path, fn(*args), data)
+    return assoc_path(_path, fn(*args), data)
 
 
 @curry_n_dec(3)
@@ -737,30 +1890,13 @@ def extract(key, data):
 
 
 @curry_n_dec(2)
-def modify_keys_recursive(fn, value):
-    if isinstance(value, list):
-        return mapl(modify_keys_recursive.c(fn), value)
-
-    if isinstance(value, dict):
-        return zip_obj(
-            mapl(fn, value.keys()),
-            mapl(modify_keys_recursive.c(fn), value.values())
-        )
+def modify_keys_recursive(fn, value, in_place=False):
+    return walk_tree(value, key=fn, in_place=in_place)
 
-    return value
 
 @curry_n_dec(2)
-def modify_values_recursive(fn, value):
-    if isinstance(value, list):
-        return mapl(modify_values_recursive.c(fn), value)
-
-    if isinstance(value, dict):
-        return zip_obj(
-            value.keys(),
-            mapl(modify_values_recursive.c(fn), value.values())
-        )
-
-    return fn(value)
+def modify_values_recursive(fn, value, in_place=False):
+    return walk_tree(value, leaf=fn, in_place=in_place)
 
 
 def do_pipe(value, fns):
@@ -775,15 +1911,13 @@ def do_pipe(value, fns):
 
 
 def get_dupes(l):
-    seen = set()
-    dupes = set()
-    for item in l:
-        if item in seen:
-            dupes.add(item)
-        else:
-            seen.add(item)
+    # A set as always, or a list of dupes() when the items can't go in one
+    found = dupes(l)
 
-    return dupes
+    try:
+        return set(found)
+    except TypeError:
+        return found
 
 
 @curry_n_dec(2)
@@ -821,6 +1955,7 @@ def do_all(iterable):
         pass
 
 
+@memoize(typed=True)
 def parse_bool(value):
     if type(value) == bool:
         return value
@@ -888,6 +2023,352 @@ class Obj(object):
             raise AttributeError(name)
 
 
+class Table(object):
+    """
+    A list of records stored as one list per key instead of one dict per
+    record, which takes a lot less memory for wide, homogeneous data. pluck,
+    group_by_key, create_map_of, and filterl/reject with prop_eq, where or
+    where_eq work a column at a time. Anything else sees the records, which
+    are built as they're iterated.
+    """
+    # Marks a record that didn't have a key, as opposed to a None value
+    MISSING = object()
+
+    def __init__(self, records=(), columns=None, length=0):
+        if columns is not None:
+            self.columns = columns
+            self.length = length
+            return
+
+        self.columns = {}
+        self.length = 0
+
+        for idx, record in enumerate(records):
+            for key, value in record.items():
+                column = self.columns.get(key)
+                if column is None:
+                    column = self.columns[key] = [Table.MISSING] * idx
+
+                column.append(value)
+
+            self.length = idx + 1
+
+            if len(record) != len(self.columns):
+                for column in self.columns.values():
+                    if len(column) < self.length:
+                        column.append(Table.MISSING)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for idx in range(self.length):
+            yield self.record(idx)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return self.take(range(self.length)[idx])
+
+        return self.record(range(self.length)[idx])
+
+    def __repr__(self):
+        return 'Table({!r})'.format(list(self))
+
+    def record(self, idx):
+        missing = Table.MISSING
+
+        return {
+            key: column[idx]
+            for key, column in self.columns.items()
+            if column[idx] is not missing
+        }
+
+    def records(self):
+        return list(self)
+
+    def column(self, key):
+        """
+        Values for key in every record, with None where it's missing like prop
+        """
+        column = self.columns.get(key)
+        if column is None:
+            return [None] * self.length
+
+        missing = Table.MISSING
+
+        return [None if value is missing else value for value in column]
+
+    def take(self, indices):
+        indices = list(indices)
+        columns = {
+            key: [column[idx] for idx in indices]
+            for key, column in self.columns.items()
+        }
+
+        return Table(columns=columns, length=len(indices))
+
+    def mask(self, fn):
+        kind, args = getattr(fn, '_fn', None), getattr(fn, '_args', ())
+
+        if kind is prop_eq and len(args) == 2:
+            key, value = args
+
+            return [item == value for item in self.column(key)]
+
+        if kind in (where, where_eq) and len(args) == 1:
+            mask = [True] * self.length
+            for key, test in args[0].items():
+                column = self.column(key)
+                if kind is where:
+                    mask = [m and bool(test(item)) for m, item in zip(mask, column)]
+                else:
+                    mask = [m and item == test for m, item in zip(mask, column)]
+
+            return mask
+
+        return [bool(fn(record)) for record in self]
+
+    def group(self, key):
+        indices = {}
+        for idx, value in enumerate(self.column(key)):
+            indices.setdefault(value, []).append(idx)
+
+        # Reorder every column once so each group is a slice, rather than
+        # gathering every column again for each group
+        ordered = self.take(idx for idxs in indices.values() for idx in idxs)
+
+        result = {}
+        start = 0
+        for value, idxs in indices.items():
+            end = start + len(idxs)
+            result[value] = Table(
+                columns={k: column[start:end] for k, column in ordered.columns.items()},
+                length=end - start,
+            )
+            start = end
+
+        return result
+
+
+# Persistent map. PMap is an immutable hash array mapped trie: updates copy
+# only the 32 slot nodes on the way down to the key, so they're O(log n) and
+# share everything else with the original. assoc, assoc_path, merge, omit
+# and friends return PMaps when given them. Branches are 32 slot lists,
+# entries are (hash, key, value) tuples, and keys whose hashes are equal
+# share a dict.
+PMAP_BITS = 5
+PMAP_MASK = (1 << PMAP_BITS) - 1
+
+
+def pmap_hash(key):
+    return hash(key) & 0xFFFFFFFFFFFFFFFF
+
+
+def pmap_get(node, h, key):
+    shift = 0
+    while node is not None:
+        slot = node[(h >> shift) & PMAP_MASK]
+        kind = type(slot)
+
+        if kind is tuple:
+            if slot[1] is key or slot[1] == key:
+                return slot[2]
+
+            break
+        elif kind is dict:
+            return slot[key]
+
+        node = slot
+        shift += PMAP_BITS
+
+    raise KeyError(key)
+
+
+def pmap_pair(shift, entry1, entry2):
+    branch = [None] * (PMAP_MASK + 1)
+    idx1 = (entry1[0] >> shift) & PMAP_MASK
+    idx2 = (entry2[0] >> shift) & PMAP_MASK
+
+    if idx1 == idx2:
+        branch[idx1] = pmap_pair(shift + PMAP_BITS, entry1, entry2)
+    else:
+        branch[idx1] = entry1
+        branch[idx2] = entry2
+
+    return branch
+
+
+def pmap_assoc(node, shift, entry):
+    """
+    Returns the new node and whether the key wasn't there before
+    """
+    h, key, value = entry
+    idx = (h >> shift) & PMAP_MASK
+    slot = node[idx]
+    kind = type(slot)
+    added = True
+
+    if slot is None:
+        slot = entry
+    elif kind is tuple:
+        if slot[1] is key or slot[1] == key:
+            slot, added = entry, False
+        elif slot[0] == h:
+            slot = {slot[1]: slot[2], key: value}
+        else:
+            slot = pmap_pair(shift + PMAP_BITS, slot, entry)
+    elif kind is dict:
+        if pmap_hash(next(iter(slot))) == h:
+            added = key not in slot
+            slot = dict(slot)
+            slot[key] = value
+        else:
+            # Push the collided keys down a level to make room
+            branch = [None] * (PMAP_MASK + 1)
+            branch[(pmap_hash(next(iter(slot))) >> (shift + PMAP_BITS)) & PMAP_MASK] = slot
+            slot, added = pmap_assoc(branch, shift + PMAP_BITS, entry)
+    else:
+        slot, added = pmap_assoc(slot, shift + PMAP_BITS, entry)
+
+    node = list(node)
+    node[idx] = slot
+
+    return node, added
+
+
+def pmap_dissoc(node, shift, h, key):
+    idx = (h >> shift) & PMAP_MASK
+    slot = node[idx]
+    kind = type(slot)
+
+    if slot is None:
+        return node
+    elif kind is tuple:
+        if not (slot[1] is key or slot[1] == key):
+            return node
+
+        slot = None
+    elif kind is dict:
+        if key not in slot:
+            return node
+
+        slot = dict(slot)
+        del slot[key]
+
+        if len(slot) == 1:
+            (k, v), = slot.items()
+            slot = (h, k, v)
+    else:
+        child = pmap_dissoc(slot, shift + PMAP_BITS, h, key)
+        if child is slot:
+            return node
+
+        slot = child
+
+    node = list(node)
+    node[idx] = slot
+
+    # Let the parent drop us entirely once we're empty
+    return None if node.count(None) == len(node) else node
+
+
+def pmap_entries(node):
+    stack = [node]
+    while stack:
+        for slot in stack.pop():
+            kind = type(slot)
+
+            if kind is tuple:
+                yield slot[1], slot[2]
+            elif kind is dict:
+                yield from slot.items()
+            elif slot is not None:
+                stack.append(slot)
+
+
+class PMap(Mapping):
+    """
+    Immutable mapping with O(log n) updates that share structure with the
+    map they came from. Use freeze to turn nested dicts into PMaps and thaw
+    to turn them back.
+    """
+    def __init__(self, data=(), root=None, length=0):
+        self.root = root
+        self.length = length
+
+        if data:
+            result = self.update(data)
+            self.root, self.length = result.root, result.length
+
+    def __getitem__(self, key):
+        if self.root is None:
+            raise KeyError(key)
+
+        return pmap_get(self.root, pmap_hash(key), key)
+
+    def __iter__(self):
+        return (key for key, _ in self.items())
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return 'PMap({!r})'.format(dict(self.items()))
+
+    def items(self):
+        return pmap_entries(self.root) if self.root is not None else iter(())
+
+    def set(self, key, value):
+        root = self.root or [None] * (PMAP_MASK + 1)
+        root, added = pmap_assoc(root, 0, (pmap_hash(key), key, value))
+
+        return PMap(root=root, length=self.length + added)
+
+    def delete(self, key):
+        if self.root is None:
+            return self
+
+        root = pmap_dissoc(self.root, 0, pmap_hash(key), key)
+        if root is self.root:
+            return self
+
+        return PMap(root=root, length=self.length - 1)
+
+    def update(self, *dicts):
+        result = self
+        for d in dicts:
+            for key, value in (d.items() if hasattr(d, 'items') else d):
+                result = result.set(key, value)
+
+        return result
+
+
+def freeze(value):
+    """
+    Recursively turn dicts into PMaps
+    """
+    if isinstance(value, dict):
+        return PMap({key: freeze(member) for key, member in value.items()})
+
+    if isinstance(value, list):
+        return [freeze(member) for member in value]
+
+    return value
+
+
+def thaw(value):
+    """
+    Recursively turn PMaps back into dicts
+    """
+    if isinstance(value, PMap):
+        return {key: thaw(member) for key, member in value.items()}
+
+    if isinstance(value, list):
+        return [thaw(member) for member in value]
+
+    return value
+
+
 def thread_last(value, ops):
     for key, args in ops.items():
         if type(args) != tuple:
@@ -952,38 +2433,79 @@ def ellipsize(s, l, suffix='...'):
     return s + suffix
 
 
+CASE_SPACES = re.compile(' +')
+CASE_LEADING = re.compile('(^_)_*([A-Z][a-z]+)')
+CASE_BOUNDARY = re.compile('([a-z0-9])([A-Z])')
+
+
+@memoize()
+def case_words(value):
+    """
+    Splits value into the lower case words to_snake joins with underscores,
+    so every case can be built from a single tokenization.
+    """
+    if ' ' in value:
+        value = CASE_SPACES.sub('_', value)
+
+    if value[:1] == '_':
+        value = CASE_LEADING.sub(r'\1_\2', value)
+
+    return tuple(CASE_BOUNDARY.sub(r'\1_\2', value).lower().split('_'))
+
+
+CASES = {
+    'snake': '_'.join,
+    'kebab': '-'.join,
+    'screaming_snake': lambda words: '_'.join(words).upper(),
+    'human': lambda words: ' '.join(words).title(),
+    'camel': lambda words: words[0] + ''.join([word.capitalize() for word in words[1:]]),
+    'pascal': lambda words: ''.join([word.capitalize() for word in words]),
+}
+
+
+@curry_n_dec(2)
+def to_case(case, value):
+    return CASES[case](case_words(value))
+
+
+@curry_n_dec(2)
+def to_case_all(case, values):
+    """
+    Converts each of values to case, e.g. to_case_all('camel', d.keys())
+    """
+    join = CASES[case]
+
+    return [join(case_words(value)) for value in values]
+
+
+@memoize()
 def to_snake(value):
-    return re.sub(
-        '([a-z0-9])([A-Z])',
-        r'\1_\2',
-        re.sub(
-            '(^_)_*([A-Z][a-z]+)',
-            r'\1_\2',
-            re.sub(r' +', '_', value),
-        )
-    ).lower()
+    return '_'.join(case_words(value))
 
 
+@memoize()
 def to_human(value):
-    return to_snake(value).replace("_", " ").title()
+    return ' '.join(case_words(value)).title()
 
 
+@memoize()
 def to_kebab(value):
-    return to_snake(value).replace('_', '-')
+    return '-'.join(case_words(value))
 
 
+@memoize()
 def to_screaming_snake(value):
-    return to_snake(value).upper()
+    return '_'.join(case_words(value)).upper()
 
 
+@memoize()
 def to_camel(value):
-    first, *rest = to_snake(value).split('_')
-
-    return first + "".join([word.capitalize() for word in rest])
+    return CASES['camel'](case_words(value))
 
 
+@memoize()
 def to_pascal(value):
-    return "".join([word.capitalize() for word in to_snake(value).split('_')])
+    return CASES['pascal'](case_words(value))
 
 
 def switcher(k, m):
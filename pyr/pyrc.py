@@ -0,0 +1,113 @@
+#!/usr/local/bin/python3 -S
+
+# Thin client for `pyr.py --serve`. Takes the same arguments as pyr.py and
+# falls back to running it directly if no server is listening. Runs with -S
+# since skipping site is a good chunk of what's left of startup.
+
+import os, socket, struct, sys, threading
+
+FRAME = struct.Struct('>cI')
+
+
+def default_socket():
+  # Keep in sync with cli.py
+  return os.environ.get('PYR_SOCKET') or os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or os.path.join(
+      os.environ.get('TMPDIR') or '/tmp',
+      'pyr-{}'.format(os.getuid()),
+    ),
+    'pyr.sock',
+  )
+
+
+def is_private(path):
+  # A socket in a shared directory could have been put there by anyone, so
+  # only trust one that we own in a directory nobody else can write to
+  try:
+    socket_stat = os.stat(path)
+    dir_stat = os.stat(os.path.dirname(path) or '.')
+  except OSError:
+    return False
+
+  return socket_stat.st_uid == dir_stat.st_uid == os.getuid() and not dir_stat.st_mode & 0o022
+
+
+def reads_file(args):
+  # argparse takes any unambiguous prefix of --file too
+  for arg in args:
+    if arg == '--':
+      break
+
+    name = arg.split('=', 1)[0]
+    if len(name) > 2 and '--file'.startswith(name):
+      return True
+
+  return False
+
+
+def send_stdin(sock):
+  # Read the raw fd rather than sys.stdin.buffer, since exiting while this
+  # thread holds the buffer's lock aborts the interpreter
+  try:
+    while True:
+      chunk = os.read(0, 65536)
+      if not chunk:
+        break
+
+      sock.sendall(chunk)
+
+    sock.shutdown(socket.SHUT_WR)
+  except OSError:
+    # The server hung up early, e.g. because the expression raised
+    pass
+
+
+def read_exactly(sock, size):
+  data = b''
+  while len(data) < size:
+    chunk = sock.recv(size - len(data))
+    if not chunk:
+      raise EOFError("pyr server closed the connection")
+
+    data += chunk
+
+  return data
+
+
+def main():
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  path = default_socket()
+
+  # Checking the directory as well as the socket means nobody can swap in
+  # their own socket between the check and the connect
+  try:
+    if not is_private(path):
+      raise OSError("no private pyr server at {}".format(path))
+
+    sock.connect(path)
+  except OSError:
+    pyr = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'pyr.py')
+    os.execv(sys.executable, [sys.executable, pyr] + sys.argv[1:])
+
+  header = '\0'.join([os.getcwd()] + sys.argv[1:]).encode('utf-8')
+  sock.sendall(struct.pack('>I', len(header)) + header)
+
+  if reads_file(sys.argv[1:]):
+    sock.shutdown(socket.SHUT_WR)
+  else:
+    threading.Thread(target=send_stdin, args=(sock,), daemon=True).start()
+
+  outputs = {b'o': sys.stdout.buffer, b'e': sys.stderr.buffer}
+  while True:
+    channel, size = FRAME.unpack(read_exactly(sock, FRAME.size))
+
+    if channel == b'x':
+      sys.exit(size)
+
+    output = outputs[channel]
+    output.write(read_exactly(sock, size))
+    output.flush()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,97 @@
+# pyr.py --serve, kept apart from cli.py so plain runs don't import any of it
+
+import io, os, socketserver, signal, struct, sys, traceback
+
+from cli import make_parser, check_args, run
+
+# Server protocol: the client sends a 4 byte length and a header of its cwd
+# and argv separated by null bytes, followed by its stdin. The server replies with
+# frames of a 1 byte channel (o for stdout, e for stderr) and a 4 byte length,
+# ending with an x frame whose length field is the exit status.
+FRAME = struct.Struct('>cI')
+
+
+class FrameWriter(io.RawIOBase):
+  def __init__(self, sock, channel):
+    self.sock = sock
+    self.channel = channel
+
+  def writable(self):
+    return True
+
+  def write(self, data):
+    self.sock.sendall(FRAME.pack(self.channel, len(data)) + bytes(data))
+
+    return len(data)
+
+
+def handle_request(sock):
+  reader = sock.makefile('rb')
+  size, = struct.unpack('>I', reader.read(4))
+  cwd, *argv = reader.read(size).decode('utf-8').split('\0')
+
+  stdin = io.TextIOWrapper(reader, encoding='utf-8')
+  stdout = io.TextIOWrapper(io.BufferedWriter(FrameWriter(sock, b'o')), encoding='utf-8')
+  stderr = io.TextIOWrapper(io.BufferedWriter(FrameWriter(sock, b'e')), encoding='utf-8')
+
+  status = 0
+  try:
+    parser = make_parser(stdout=stdout, stderr=stderr)
+    args = parser.parse_args(argv)
+
+    if args.serve or args.expression is None:
+      parser.error("pyrc needs an expression")
+
+    check_args(parser, args)
+
+    if args.file:
+      args.file = os.path.join(cwd, args.file)
+
+    run(args, stdin, stdout, stderr)
+  except SystemExit as exc:
+    # Like the interpreter, print anything that isn't an exit status
+    status = exc.code or 0
+    if not isinstance(status, int):
+      stderr.write('{}\n'.format(status))
+      status = 1
+  except Exception:
+    stderr.write(traceback.format_exc())
+    status = 1
+  finally:
+    stdout.flush()
+    stderr.flush()
+    sock.sendall(FRAME.pack(b'x', status))
+
+
+def serve(path):
+  class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+      handle_request(self.request)
+
+  class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+  directory = os.path.dirname(path) or '.'
+  os.makedirs(directory, mode=0o700, exist_ok=True)
+
+  dir_stat = os.stat(directory)
+  if dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o022:
+    sys.exit("pyr: {} is writable by other users, refusing to serve from it".format(directory))
+
+  # Clean up after a server that didn't shut down cleanly
+  if os.path.exists(path):
+    os.unlink(path)
+
+  # Pre-load lib.py so the first request doesn't pay for it
+  import lib
+
+  # Make sure the socket gets cleaned up when we're killed
+  signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+
+  with Server(path, Handler) as server:
+    os.chmod(path, 0o600)
+
+    try:
+      server.serve_forever()
+    finally:
+      os.unlink(path)
@@ -6,6 +6,7 @@ export EDITOR='kak'
 setopt GLOB_DOTS
 
 alias pyr='pyr.py'
+alias pyrc='pyrc.py'
 alias sum='paste -sd+ - | bc'
 alias rmkak='rm ./**/*.kak.*'
 alias avg="awk '{ total += \$1; count++ } END { print total/count }'"